@@ -0,0 +1,155 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from cache import TTLCache
+from flow_control import limit
+from tracing import span
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "audio")
+TTS_MODEL = "tts-1"
+TTS_VOICE = "nova"
+
+# Eviction policy for synthesized speech on disk
+MAX_STORE_BYTES = 200 * 1024 * 1024
+MAX_AUDIO_AGE = 7 * 24 * 60 * 60
+EVICTION_INTERVAL = 60
+# A session's references pin its clips until it has been idle this long
+SESSION_REF_TTL = 2 * 60 * 60
+
+# Encoded clips kept in memory for rendering, bounded by total size
+AUDIO_MEMORY_BYTES = 64 * 1024 * 1024
+audio_bytes_cache = TTLCache(maxsize=1024, max_bytes=AUDIO_MEMORY_BYTES, name="audio")
+
+
+# Function to address speech by what was said and how it was synthesized
+def audio_key(text, voice=TTS_VOICE, model=TTS_MODEL):
+    return hashlib.sha256(f"{model}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+
+# Content-addressed store of synthesized mp3 files with atomic writes,
+# size/age-bounded eviction and per-session references that pin clips still
+# shown in a chat history
+class AudioStore:
+    def __init__(self, directory=AUDIO_DIR, max_bytes=MAX_STORE_BYTES, max_age=MAX_AUDIO_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._sessions = {}  # session id -> (set of keys, last seen)
+        self._last_eviction = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def read(self, key):
+        path = self.path(key)
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # Recently played clips are evicted last
+        return data
+
+    # Write through a temp file so a reader never sees a partial mp3
+    def write(self, key, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.maybe_evict()
+
+    # Function to record which clips a session still shows
+    def retain(self, session_id, keys):
+        with self._lock:
+            self._sessions[session_id] = (set(keys), time.time())
+
+    def _pinned_keys(self, now):
+        with self._lock:
+            for session_id, (_, last_seen) in list(self._sessions.items()):
+                if now - last_seen > SESSION_REF_TTL:
+                    del self._sessions[session_id]
+            return set().union(*(keys for keys, _ in self._sessions.values()))
+
+    def maybe_evict(self):
+        now = time.time()
+        if now - self._last_eviction >= EVICTION_INTERVAL:
+            self._last_eviction = now
+            self.evict()
+
+    # Function to drop expired clips, then the least recently used ones until
+    # the store fits its byte budget; pinned clips are never removed
+    def evict(self):
+        now = time.time()
+        pinned = self._pinned_keys(now)
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".mp3"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.name[:-4]))
+
+        total = sum(size for _, size, _ in files)
+        for mtime, size, key in sorted(files):
+            if key in pinned:
+                continue
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                continue
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                continue
+            audio_bytes_cache.pop(key)
+            total -= size
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AudioStore()
+        return _store
+
+
+# Function to synthesize speech once per (text, voice, model); returns its key
+def synthesize(openai_client, text, voice=TTS_VOICE, model=TTS_MODEL):
+    store = get_store()
+    key = audio_key(text, voice, model)
+    if not store.exists(key):
+        with span("openai.speech", model=model, characters=len(text)) as current, limit("openai_audio"):
+            response = openai_client.audio.speech.create(
+                model=model,
+                voice=voice,
+                input=text
+            )
+            current.set(bytes_received=len(response.content))
+        store.write(key, response.content)
+    return key
+
+
+# Function to get a clip's mp3 bytes, served from memory when possible
+def load_audio(key):
+    data = audio_bytes_cache.get(key)
+    if data is None:
+        try:
+            data = get_store().read(key)
+        except OSError:
+            return None
+        audio_bytes_cache.set(key, data)
+    return data
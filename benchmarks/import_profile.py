@@ -0,0 +1,72 @@
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+
+# Import-time profile of each page: the page's module-level imports are replayed
+# in a fresh interpreter under -X importtime, after Streamlit itself (which the
+# server has already loaded), so the report shows only what switching to the
+# page costs before any of its code runs.
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["streamlit_app.py", "page1.py", "page2.py", "page3.py", "page4.py"]
+BASELINE = "import streamlit\nimport streamlit.components.v1\n"
+MARKER = "--page imports--"
+MISSING = "missing: "
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+# Function to collect the module-level import statements of a page script
+def page_imports(page):
+    with open(os.path.join(REPO_DIR, page)) as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+# Function to import a page's modules in a fresh interpreter; returns
+# (total seconds, [(seconds, module)] for top-level imports, [missing dependencies]).
+# A missing dependency is reported and the remaining imports are still measured.
+def profile_page(page):
+    statements = "".join(
+        f"try:\n    {statement}\nexcept ImportError as e:\n    sys.stderr.write({MISSING!r} + str(e) + '\\n')\n"
+        for statement in page_imports(page)
+    )
+    source = BASELINE + f"import sys\nsys.stderr.write({MARKER!r} + '\\n')\n" + statements
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", source],
+        cwd=REPO_DIR, capture_output=True, text=True
+    )
+    lines = result.stderr.splitlines()
+    lines = lines[lines.index(MARKER) + 1:] if MARKER in lines else []
+    modules, missing = [], []
+    for line in lines:
+        match = _LINE.match(line)
+        if match and not match.group(3):
+            modules.append((int(match.group(2)) / 1e6, match.group(4)))
+        elif line.startswith(MISSING):
+            missing.append(line[len(MISSING):])
+    if result.returncode:
+        missing.append(result.stderr.strip().splitlines()[-1])
+    return sum(seconds for seconds, _ in modules), sorted(modules, reverse=True), missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show what each page's imports cost on a cold start.")
+    parser.add_argument("pages", nargs="*", default=PAGES)
+    parser.add_argument("--top", type=int, default=8, help="heaviest top-level imports to list per page")
+    args = parser.parse_args(argv)
+
+    for page in args.pages:
+        total, modules, missing = profile_page(page)
+        print(f"{page}: {total * 1000:.0f} ms")
+        for seconds, module in modules[:args.top]:
+            print(f"  {seconds * 1000:8.1f} ms  {module}")
+        for error in missing:
+            print(f"  not installed: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from collections import namedtuple
+from datetime import date
+
+# A scripted user journey through one page. Each step is (label, action); the
+# action drives the AppTest (widget input followed by .run()) and is timed as
+# one rerun.
+Journey = namedtuple("Journey", ["name", "page", "steps"])
+
+# Secrets every page reads, pointed at the stub server's dummy keys
+SECRETS = {
+    "api_key": "stub-places-key",
+    "key1": "stub-openai-key",
+    "openai_api_key": "stub-openai-key",
+    "OpenWeatherAPIkey": "stub-weather-key",
+}
+
+
+def _button(at, label):
+    for button in at.button:
+        if button.label == label:
+            return button
+    raise LookupError(f"no button labelled {label!r}")
+
+
+def _search(query):
+    return lambda at: at.text_input[0].input(query).run()
+
+
+def _chat(text):
+    return lambda at: at.chat_input[0].set_value(text).run()
+
+
+def _click(label=None, key=None):
+    if key is not None:
+        return lambda at: at.button(key=key).click().run()
+    return lambda at: _button(at, label).click().run()
+
+
+# Function to run the page3 voice path directly: the recorder is a custom
+# component AppTest cannot drive, so the transcribe/translate/speak pipeline
+# is exercised the way the page calls it
+def _voice(recording=b"RIFF" + b"\x00" * 32000, target_language="French"):
+    def action(at):
+        from resources import get_openai_client
+        from voice_pipeline import run_voice_pipeline, transcribe_bytes
+        client = get_openai_client(SECRETS["openai_api_key"])
+        text = transcribe_bytes(client, recording)
+        for event, value in run_voice_pipeline(client, text, target_language):
+            pass
+        return at
+    return action
+
+
+JOURNEYS = [
+    Journey("explore", "page1.py", [
+        ("open page", lambda at: at.run()),
+        ("routed search", _search("restaurants in Paris")),
+        ("raise min rating", lambda at: at.slider[0].set_value(4.5).run()),
+        ("model-routed search", _search("somewhere quiet to read books")),
+        ("repeat search", _search("restaurants in Paris")),
+    ]),
+    Journey("itinerary", "page2.py", [
+        ("open page", lambda at: at.run()),
+        ("search", _search("museums in Rome")),
+        ("add place 1", _click(key="add_0")),
+        ("add place 2", _click(key="add_1")),
+        ("add place 3", _click(key="add_4")),
+        ("pick date", lambda at: at.date_input[0].set_value(date(2026, 5, 14)).run()),
+        ("generate itinerary", _click("Generate AI Itinerary")),
+        ("rerun with itinerary", lambda at: at.slider[0].set_value(4.0).run()),
+    ]),
+    Journey("translator", "page3.py", [
+        ("open page", lambda at: at.run()),
+        ("translate text", _chat("Where is the nearest train station?")),
+        ("translate another", _chat("How much does a ticket to the airport cost?")),
+        ("repeat phrase", _chat("Where is the nearest train station?")),
+        ("voice pipeline", _voice()),
+    ]),
+    Journey("assistant", "page4.py", [
+        ("open page", lambda at: at.run()),
+        ("ask question", _chat("What documents do I need to travel abroad?")),
+        ("exact fact", _chat("What is the emergency number for Kenya?")),
+        ("follow-up", _chat("And what about travel insurance?")),
+        ("repeat question", _chat("What documents do I need to travel abroad?")),
+    ]),
+]
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.journeys import JOURNEYS, SECRETS
+from benchmarks.stub_servers import StubServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Function to point every upstream URL and client at the stub server. Must run
+# before the pages create their OpenAI clients.
+def use_stub_server(base_url):
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ["OPENAI_API_BASE"] = f"{base_url}/v1"  # LangChain's ChatOpenAI
+    os.environ["OPENAI_API_KEY"] = SECRETS["key1"]
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+    import places
+    import thumbnails
+    import weather
+    places.TEXT_SEARCH_URL = f"{base_url}/maps/api/place/textsearch/json"
+    thumbnails.PHOTO_URL = f"{base_url}/maps/api/place/photo"
+    weather.WEATHER_URL = f"{base_url}/data/2.5/weather"
+
+
+# Function to start a cold pass: every in-process cache is emptied and the disk
+# caches and vector store move to a fresh directory, so nothing from a previous
+# pass (or from the real .cache/) is reused
+def reset_state(cache_dir):
+    import streamlit as st
+    import audio_store
+    import embedding_cache
+    import http_client
+    import thumbnails
+    import translation
+    from cache import TTLCache
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(cache_dir)
+    thumbnails.THUMBNAIL_DIR = os.path.join(cache_dir, "thumbnails")
+    audio_store._store = audio_store.AudioStore(directory=os.path.join(cache_dir, "audio"))
+    embedding_cache._store = embedding_cache.EmbeddingStore(path=os.path.join(cache_dir, "embeddings.sqlite3"))
+    translation._store = translation.TranslationStore(path=os.path.join(cache_dir, "translations.sqlite3"))
+    try:
+        import vectorstore
+        vectorstore.CHROMA_PATH = os.path.join(cache_dir, "chroma")
+        vectorstore.INDEX_DIR = None  # Always ingest with the stubbed embeddings
+    except ImportError:
+        pass  # page4 will report the missing dependency itself
+
+    for module in list(sys.modules.values()):
+        if not os.path.dirname(getattr(module, "__file__", None) or "") == REPO_DIR:
+            continue
+        for value in list(vars(module).values()):
+            if isinstance(value, TTLCache):
+                value.clear()
+    http_client._breakers.clear()
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+def _totals(stats):
+    return (
+        sum(route["calls"] for route in stats.values()),
+        sum(route["bytes_in"] for route in stats.values()),
+        sum(route["bytes_out"] for route in stats.values()),
+    )
+
+
+# Function to run one pass of a journey in a fresh session; returns one row per rerun
+def run_journey(journey, stub, pass_name, timeout, trace_memory):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(REPO_DIR, journey.page), default_timeout=timeout)
+    for name, value in SECRETS.items():
+        at.secrets[name] = value
+
+    rows = []
+    for label, action in journey.steps:
+        stub.reset()
+        if trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        error = None
+        try:
+            action(at)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - started
+        if error is None and at.exception:
+            error = at.exception[0].message
+        stats = stub.stats()
+        calls, bytes_in, bytes_out = _totals(stats)
+        rows.append({
+            "journey": journey.name,
+            "pass": pass_name,
+            "step": label,
+            "seconds": round(seconds, 4),
+            "calls": calls,
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "peak_bytes": tracemalloc.get_traced_memory()[1] if trace_memory else None,
+            "routes": {route: counts["calls"] for route, counts in sorted(stats.items())},
+            "error": error,
+        })
+        if error is not None:
+            break  # Later steps depend on widgets this rerun did not render
+    return rows
+
+
+def format_rows(rows):
+    lines = [f"{'journey':<11} {'pass':<6} {'step':<22} {'ms':>8} {'calls':>5} {'KB out':>8} {'KB in':>8} {'peak MB':>8}  upstream calls"]
+    for row in rows:
+        peak = f"{row['peak_bytes'] / 2**20:8.1f}" if row["peak_bytes"] is not None else f"{'-':>8}"
+        routes = " ".join(f"{route}={calls}" for route, calls in row["routes"].items())
+        lines.append(
+            f"{row['journey']:<11} {row['pass']:<6} {row['step']:<22} {row['seconds'] * 1000:8.0f} {row['calls']:5d} "
+            f"{row['bytes_in'] / 1024:8.1f} {row['bytes_out'] / 1024:8.1f} {peak}  {routes}"
+        )
+        if row["error"]:
+            lines.append(f"{'':<11} error: {row['error']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay scripted journeys through each page against local stub servers.")
+    parser.add_argument("--journeys", nargs="*", help="journey names to run (default: all)")
+    parser.add_argument("--warm-passes", type=int, default=1, help="passes per journey after the cold one, in new sessions with caches kept")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply every stubbed upstream latency")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per rerun")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc; wall times are less inflated")
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args(argv)
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+    journeys = [journey for journey in JOURNEYS if not args.journeys or journey.name in args.journeys]
+    trace_memory = not args.no_memory
+    cache_dir = tempfile.mkdtemp(prefix="travel-bench-")
+    rows = []
+    with StubServer(latency_scale=args.latency_scale) as stub:
+        use_stub_server(stub.base_url)
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            for journey in journeys:
+                reset_state(cache_dir)
+                rows.extend(run_journey(journey, stub, "cold", args.timeout, trace_memory))
+                for number in range(args.warm_passes):
+                    rows.extend(run_journey(journey, stub, f"warm{number + 1}" if args.warm_passes > 1 else "warm", args.timeout, trace_memory))
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(format_rows(rows))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+    return 1 if any(row["error"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+import base64
+import hashlib
+import io
+import json
+import multiprocessing
+import socket
+import struct
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-ins for every upstream the pages call: Google Places text search
+# and photos, OpenWeatherMap current weather, and OpenAI chat completions
+# (plain, streamed and tool calls), embeddings, transcription and speech.
+# The server runs in its own process so its allocations and threads do not
+# show up in the app's wall time or peak memory.
+
+# Seconds added before answering, per route
+DEFAULT_LATENCY = {
+    "places": 0.15,
+    "photo": 0.05,
+    "weather": 0.08,
+    "chat": 0.4,
+    "embeddings": 0.1,
+    "transcriptions": 0.3,
+    "speech": 0.25,
+}
+
+# Payload shapes; override any of them through StubServer(payloads=...)
+DEFAULT_PAYLOADS = {
+    "places_per_page": 20,
+    "places_pages": 3,
+    "photo_size": (400, 300),
+    "chat_reply": (
+        "Light layers and a waterproof jacket will do today. Carry water, wear "
+        "comfortable shoes and plan indoor stops for the warmest hours. "
+    ) * 4,
+    # Seconds between streamed chat chunks
+    "token_interval": 0.01,
+    # Arguments returned when the request offers tools
+    "tool_location": "Paris",
+    "embedding_dim": 1536,
+    "transcript": "Where is the nearest train station? How much is a ticket to the airport?",
+    # Speech bytes returned per character of input text
+    "speech_bytes_per_char": 400,
+}
+
+ROUTES = {
+    "/maps/api/place/textsearch/json": "places",
+    "/maps/api/place/photo": "photo",
+    "/data/2.5/weather": "weather",
+    "/v1/chat/completions": "chat",
+    "/v1/embeddings": "embeddings",
+    "/v1/audio/transcriptions": "transcriptions",
+    "/v1/audio/speech": "speech",
+}
+
+
+def _seed(*parts):
+    return int.from_bytes(hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).digest()[:8], "big")
+
+
+# Function to build one page of deterministic Text Search results for a query
+def places_page(query, page, payloads):
+    per_page = payloads["places_per_page"]
+    seed = _seed(query)
+    center_lat = (seed % 120) - 60 + 0.5
+    center_lng = (seed // 120 % 340) - 170 + 0.5
+    results = []
+    for i in range(page * per_page, (page + 1) * per_page):
+        place_seed = _seed(query, i)
+        results.append({
+            "name": f"{query.title()} #{i + 1}",
+            "place_id": f"stub-{seed:x}-{i}",
+            "formatted_address": f"{i + 1} Stub Street",
+            "rating": round(3.0 + (place_seed % 21) / 10, 1),
+            "user_ratings_total": place_seed % 5000,
+            "price_level": place_seed % 4 + 1,
+            "geometry": {"location": {
+                "lat": center_lat + (place_seed % 1000) / 20000,
+                "lng": center_lng + (place_seed // 1000 % 1000) / 20000,
+            }},
+            "photos": [{"photo_reference": f"photo-{seed:x}-{i}", "height": 300, "width": 400}],
+        })
+    data = {"status": "OK", "results": results}
+    if page + 1 < payloads["places_pages"]:
+        token = base64.urlsafe_b64encode(json.dumps([query, page + 1]).encode("utf-8")).decode("ascii")
+        data["next_page_token"] = token
+    return data
+
+
+def weather_payload(city):
+    seed = _seed(city)
+    return {
+        "cod": 200,
+        "name": city.title(),
+        "weather": [{"id": 800 + seed % 4, "main": "Clouds", "description": "scattered clouds"}],
+        "main": {"temp": 280 + seed % 25, "feels_like": 279 + seed % 25, "humidity": 40 + seed % 50},
+        "wind": {"speed": seed % 10},
+    }
+
+
+# Function to make a deterministic unit vector for a text
+def embedding_vector(text, dim):
+    seed = _seed(text)
+    values = [((seed * (i + 1) * 2654435761) % 1000) / 1000 - 0.5 for i in range(dim)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+# Function to estimate token usage at roughly four characters per token
+def _usage(request, reply):
+    prompt = sum(len(str(message.get("content") or "")) for message in request.get("messages", [])) // 4
+    completion = len(reply) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def _jpeg(size):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (70, 130, 180)).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if url.path == "/__stats":
+            return self._send(200, json.dumps(self.server.snapshot()).encode("utf-8"), "application/json", count=False)
+        if url.path == "/__reset":
+            self.server.reset()
+            return self._send(204, b"", "text/plain", count=False)
+
+        route = ROUTES.get(url.path)
+        if route is None:
+            return self._send(404, b"{}", "application/json", count=False)
+        self.route = route
+        self.server.record(route, calls=1, bytes_in=len(body) + len(self.path))
+        time.sleep(self.server.latency.get(route, 0))
+        getattr(self, f"_{route}")(parse_qs(url.query), body)
+
+    def _send(self, status, payload, content_type, count=True):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        if count:
+            self.server.record(self.route, bytes_out=len(payload))
+
+    def _json(self, data):
+        self._send(200, json.dumps(data).encode("utf-8"), "application/json")
+
+    def _places(self, params, body):
+        payloads = self.server.payloads
+        if "pagetoken" in params:
+            query, page = json.loads(base64.urlsafe_b64decode(params["pagetoken"][0]))
+        else:
+            query, page = params.get("query", [""])[0], 0
+        self._json(places_page(query, page, payloads))
+
+    def _photo(self, params, body):
+        self._send(200, self.server.jpeg, "image/jpeg")
+
+    def _weather(self, params, body):
+        self._json(weather_payload(params.get("q", [""])[0]))
+
+    def _chat(self, params, body):
+        request = json.loads(body or b"{}")
+        payloads = self.server.payloads
+        model = request.get("model", "gpt-4o")
+        if request.get("tools") and request.get("tool_choice") != "none":
+            user_text = request["messages"][-1]["content"]
+            calls = [
+                ("get_Weather", {"location": payloads["tool_location"]}),
+                ("get_places_from_google", {"query": user_text.split(" and tell me")[0]}),
+            ]
+            message = {"role": "assistant", "content": None, "tool_calls": [
+                {"id": f"call_{i}", "type": "function",
+                 "function": {"name": name, "arguments": json.dumps(arguments)}}
+                for i, (name, arguments) in enumerate(calls)
+            ]}
+            return self._json(self._completion(model, message, "tool_calls", _usage(request, "")))
+
+        reply = payloads["chat_reply"]
+        if not request.get("stream"):
+            return self._json(self._completion(model, {"role": "assistant", "content": reply}, "stop", _usage(request, reply)))
+
+        # Server-sent events, one chunk per word, like the real streaming API
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            delta = {"content": word + (" " if i < len(words) - 1 else "")}
+            if i == 0:
+                delta["role"] = "assistant"
+            if not self._chunk(self._event(model, delta, None)):
+                return
+            time.sleep(payloads["token_interval"])
+        self._chunk(self._event(model, {}, "stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            usage_chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                           "model": model, "choices": [], "usage": _usage(request, reply)}
+            self._chunk(b"data: " + json.dumps(usage_chunk).encode("utf-8") + b"\n\n")
+        self._chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, data):
+        try:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return False  # The client closed the stream early
+        self.server.record(self.route, bytes_out=len(data))
+        return True
+
+    @staticmethod
+    def _completion(model, message, finish_reason, usage):
+        return {
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage,
+        }
+
+    @staticmethod
+    def _event(model, delta, finish_reason):
+        chunk = {
+            "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n"
+
+    def _embeddings(self, params, body):
+        request = json.loads(body or b"{}")
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dim = self.server.payloads["embedding_dim"]
+        data = []
+        for i, text in enumerate(inputs):
+            vector = embedding_vector(str(text), dim)
+            if request.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{dim}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = sum(len(str(text)) for text in inputs) // 4
+        self._json({"object": "list", "data": data, "model": request.get("model"),
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    def _transcriptions(self, params, body):
+        self._json({"text": self.server.payloads["transcript"]})
+
+    def _speech(self, params, body):
+        text = json.loads(body or b"{}").get("input", "")
+        size = max(1, len(text)) * self.server.payloads["speech_bytes_per_char"]
+        self._send(200, (b"\xff\xfb\x90\x00" * (size // 4 + 1))[:size], "audio/mpeg")
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency, payloads):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.payloads = payloads
+        self.jpeg = _jpeg(tuple(payloads["photo_size"]))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def record(self, route, calls=0, bytes_in=0, bytes_out=0):
+        with self._lock:
+            stats = self.stats.setdefault(route, {"calls": 0, "bytes_in": 0, "bytes_out": 0})
+            stats["calls"] += calls
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+
+    def snapshot(self):
+        with self._lock:
+            return {route: dict(stats) for route, stats in self.stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+
+def _serve(port, latency, payloads):
+    _StubHTTPServer(("127.0.0.1", port), latency, payloads).serve_forever()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# A stub server process with per-route latency (seconds) and payload overrides.
+# stats() returns {route: {"calls", "bytes_in", "bytes_out"}} since the last reset().
+class StubServer:
+    def __init__(self, latency=None, payloads=None, latency_scale=1.0):
+        self.latency = {route: seconds * latency_scale for route, seconds in {**DEFAULT_LATENCY, **(latency or {})}.items()}
+        self.payloads = {**DEFAULT_PAYLOADS, **(payloads or {})}
+        self.port = None
+        self._process = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout=10):
+        self.port = _free_port()
+        self._process = multiprocessing.Process(target=_serve, args=(self.port, self.latency, self.payloads), daemon=True)
+        self._process.start()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.stats()
+                return self
+            except OSError:
+                if time.monotonic() > deadline or not self._process.is_alive():
+                    raise RuntimeError("stub server did not start")
+                time.sleep(0.05)
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def stats(self):
+        with urllib.request.urlopen(f"{self.base_url}/__stats", timeout=5) as response:
+            return json.load(response)
+
+    def reset(self):
+        urllib.request.urlopen(f"{self.base_url}/__reset", timeout=5).close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
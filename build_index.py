@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+
+from vectorstore import BASE_DIR, DATAFILES_DIR, build_artifact
+
+# Offline ingestion of datafiles/ into a versioned, read-only index artifact:
+#     $ OPENAI_API_KEY=... python build_index.py --output indexes
+# then start every app replica with TRAVEL_INDEX_DIR=indexes (a shared or
+# read-only mount is fine) so none of them embeds the corpus itself.
+
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, "indexes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the travel FAQ vector store as a versioned index artifact.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="index directory; each version is written to a subdirectory and CURRENT points at the latest")
+    parser.add_argument("--datafiles", default=DATAFILES_DIR, help="directory of PDFs to ingest")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"), help="OpenAI API key (default: $OPENAI_API_KEY)")
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error("an OpenAI API key is required (--api-key or OPENAI_API_KEY)")
+
+    from openai import OpenAI
+    artifact = build_artifact(OpenAI(api_key=args.api_key), args.output, args.datafiles)
+    print(f"index {artifact['version']}: {artifact['chunks']} chunks from {len(artifact['files'])} files")
+    print(f"  embedding model {artifact['embedding_model']}, chunking {artifact['chunking']}")
+    print(f"  {os.path.join(args.output, artifact['version'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Sentinel so a cached None/empty list can be told apart from a miss
+_MISSING = object()
+
+# Named caches, for diagnostics
+_registry = {}
+
+
+# Thread-safe LRU cache with an optional time-to-live, shared by every
+# Streamlit session in the process (each session runs on its own thread).
+# With max_bytes set, values must support len() and the total is kept under it.
+# Caches created with a name are listed by named_caches().
+class TTLCache:
+    def __init__(self, maxsize=256, ttl=None, max_bytes=None, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if name is not None:
+            _registry[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._discard(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._discard(key)
+            self._data[key] = (value, expires_at)
+            if self.max_bytes is not None:
+                self.total_bytes += len(value)
+            while self._data and (len(self._data) > self.maxsize or self._over_budget()):
+                self._discard(next(iter(self._data)))
+
+    def _over_budget(self):
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    # Caller holds the lock
+    def _discard(self, key):
+        entry = self._data.pop(key, _MISSING)
+        if entry is not _MISSING and self.max_bytes is not None:
+            self.total_bytes -= len(entry[0])
+
+    def get_or_set(self, key, factory):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            self._discard(key)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    # Hit/miss counters for diagnostics
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def named_caches():
+    return dict(_registry)
@@ -0,0 +1,141 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from flow_control import limit
+from tracing import record_usage, span
+
+logger = logging.getLogger(__name__)
+
+# Tokens of chat history sent with each request; older turns go into the summary
+HISTORY_TOKEN_BUDGET = 1200
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_MAX_TOKENS = 200
+# Once the history overflows the budget, the verbatim window is cut back to this
+# share of it, so the next several turns fit again without another summary call
+SUMMARY_KEEP_FRACTION = 0.5
+# Approximate per-message framing overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Summary updates run here, after the reply has been sent
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+
+_encoding = None
+
+
+# Function to load the tokenizer once; tiktoken downloads its tables on first
+# use, so an offline server falls back to the character estimate
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+# Function to count tokens locally, falling back to ~4 characters per token
+def count_tokens(text):
+    encoding = _get_encoding() if tiktoken is not None else None
+    if not encoding:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+# Stored replies use the "system" role for display; the API should see them as the assistant's
+def _api_message(message):
+    role = "assistant" if message["role"] == "system" else message["role"]
+    return {"role": role, "content": message["content"]}
+
+
+# Conversation memory with a token budget: the newest turns that fit are sent
+# verbatim and everything older is rolled, a few turns at a time, into a
+# running summary. The summary is updated in the background after a reply has
+# been sent, so building a request never waits on the model. One instance
+# lives in each session's state.
+class ConversationMemory:
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.summary = ""
+        self.summarized_count = 0  # History messages already folded into the summary
+        self._folding = None  # Future of the summary update in progress
+        self._lock = threading.Lock()
+
+    # Function to split history into (older turns to summarize, recent turns kept verbatim).
+    # Nothing is summarized while the unsummarized turns fit the budget.
+    def _split(self, history):
+        pending = history[self.summarized_count:]
+        if sum(message_tokens(message) for message in pending) <= self.token_budget:
+            return [], pending, self.summarized_count
+        kept, used = [], 0
+        for message in reversed(pending):
+            used += message_tokens(message)
+            if used > self.token_budget * SUMMARY_KEEP_FRACTION:
+                break
+            kept.append(message)
+        kept.reverse()
+        cutoff = len(history) - len(kept)
+        return history[self.summarized_count:cutoff], kept, cutoff
+
+    # Function to fold the given turns into the current summary; returns the new summary
+    def _summarize(self, openai_client, turns):
+        transcript = "\n".join(f"{_api_message(m)['role']}: {m['content']}" for m in turns)
+        with span("openai.chat", model=SUMMARY_MODEL, purpose="summary"), limit("openai_chat"):
+            response = openai_client.chat.completions.create(
+                model=SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": "Update the running summary of a travel assistant conversation with the new turns. Keep facts the user shared, questions asked and answers given. Reply with the summary only."},
+                    {"role": "user", "content": f"Current summary:\n{self.summary or '(empty)'}\n\nNew turns:\n{transcript}"},
+                ],
+                max_tokens=SUMMARY_MAX_TOKENS,
+                temperature=0,
+            )
+        record_usage(SUMMARY_MODEL, response.usage)
+        return response.choices[0].message.content.strip()
+
+    # Function to fold turns that overflowed the budget into the summary
+    def fold(self, openai_client, history):
+        to_summarize, _, cutoff = self._split(history)
+        if to_summarize:
+            summary = self._summarize(openai_client, to_summarize)
+            self.summary, self.summarized_count = summary, cutoff
+
+    def _fold_logged(self, openai_client, history):
+        try:
+            self.fold(openai_client, history)
+        except Exception:
+            logger.warning("conversation summary update failed; retrying after the next reply", exc_info=True)
+
+    # Function to start a summary update once a reply has been sent; at most one
+    # runs per conversation, and the next request uses whatever summary exists
+    def fold_in_background(self, openai_client, history):
+        with self._lock:
+            if self._folding is None or self._folding.done():
+                self._folding = _summary_executor.submit(self._fold_logged, openai_client, list(history))
+            return self._folding
+
+    # Function to build the history part of a request from the existing summary
+    # and the newest unsummarized turns that fit the budget; never calls the model
+    def build_messages(self, history):
+        recent, used = [], 0
+        for message in reversed(history[self.summarized_count:]):
+            used += message_tokens(message)
+            if used > self.token_budget:
+                break  # Not yet folded into the summary; the update is on its way
+            recent.append(message)
+        recent.reverse()
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        messages.extend(_api_message(m) for m in recent)
+        return messages
@@ -0,0 +1,70 @@
+import os
+
+import streamlit as st
+
+from tracing import tracer
+
+# Panel rows for the most recent spans
+RECENT_ROWS = 25
+
+
+def _server_debug():
+    return os.environ.get("TRAVEL_DEBUG") == "1"
+
+
+# Function to decide whether to show the panel: ?debug=1 in the URL, or TRAVEL_DEBUG=1 for every session
+def debug_panel_enabled():
+    return st.query_params.get("debug") == "1" or _server_debug()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+# Function to render the process-wide span, token and cache stats in the sidebar
+def render_debug_panel():
+    snapshot = tracer.snapshot()
+    with st.sidebar.expander("Diagnostics", expanded=False):
+        st.markdown("**Latency by span**")
+        st.dataframe([
+            {
+                "span": name, "count": stats["count"], "errors": stats["errors"],
+                "p50 ms": _ms(stats["p50"]), "p95 ms": _ms(stats["p95"]),
+                "KB received": round(stats["bytes_received"] / 1024, 1),
+            }
+            for name, stats in snapshot["spans"].items()
+        ], hide_index=True)
+
+        st.markdown("**OpenAI tokens**")
+        st.dataframe([{"model": model, **usage} for model, usage in snapshot["tokens"].items()], hide_index=True)
+
+        st.markdown("**Caches**")
+        st.dataframe([
+            {"cache": name, "entries": stats["size"], "hits": stats["hits"], "misses": stats["misses"],
+             "hit rate": round(stats["hit_rate"], 3)}
+            for name, stats in snapshot["caches"].items()
+        ], hide_index=True)
+
+        st.markdown("**Upstreams**")
+        st.dataframe([
+            {"upstream": name, "in flight": stats["in_flight"], "throttled": stats["throttled"],
+             "wait s": round(stats["wait_seconds"], 2)}
+            for name, stats in snapshot["upstreams"].items()
+        ], hide_index=True)
+
+        st.markdown("**Coalesced calls**")
+        st.dataframe([
+            {"flight": name, "requests made": stats["leaders"], "requests shared": stats["shared"]}
+            for name, stats in snapshot["flights"].items()
+        ], hide_index=True)
+
+        st.markdown("**Recent spans**")
+        st.dataframe([
+            {"span": entry["name"], "status": entry["status"], "ms": _ms(entry["seconds"])}
+            for entry in snapshot["recent"][:RECENT_ROWS]
+        ], hide_index=True)
+
+        # The stats are process-wide (they also feed /metrics), so only the
+        # server operator may clear them, not anyone who adds ?debug=1
+        if _server_debug() and st.button("Reset stats", key="diagnostics_reset"):
+            tracer.reset()
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+
+from cache import TTLCache
+from flow_control import SingleFlight, limit
+from tracing import record_usage, span
+
+CACHE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings.sqlite3")
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# In-process LRU in front of the SQLite store
+embedding_cache = TTLCache(maxsize=4096, name="embeddings")
+
+
+# Function to key an embedding by model and normalized text
+def embedding_key(model, text):
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+# SQLite store of float32 vectors, shared by every session thread through one
+# connection guarded by a lock
+class EmbeddingStore:
+    def __init__(self, path=CACHE_DB_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+        )
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model, items):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [(key, model, array("f", vector).tobytes()) for key, vector in items],
+            )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EmbeddingStore()
+        return _store
+
+
+# Function to embed texts through the memory LRU, then the SQLite store, then
+# batched embeddings.create calls for whatever is still missing
+def embed_texts(openai_client, texts, model):
+    keys = [embedding_key(model, text) for text in texts]
+    vectors = {}
+    for key in set(keys):
+        vector = embedding_cache.get(key)
+        if vector is not None:
+            vectors[key] = vector
+
+    missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+    if missing:
+        for key, vector in get_store().get_many(missing).items():
+            vectors[key] = vector
+            embedding_cache.set(key, vector)
+
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            pending.setdefault(key, text)
+    pending = list(pending.items())
+    for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+        batch = pending[start:start + EMBEDDING_BATCH_SIZE]
+        with span("openai.embeddings", model=model, inputs=len(batch)), limit("openai_embeddings"):
+            response = openai_client.embeddings.create(
+                input=[text for _, text in batch],
+                model=model
+            )
+        record_usage(model, response.usage)
+        # Round through float32 so fresh and cached vectors are identical
+        embedded = [array("f", item.embedding).tolist() for item in sorted(response.data, key=lambda item: item.index)]
+        items = [(key, vector) for (key, _), vector in zip(batch, embedded)]
+        get_store().put_many(model, items)
+        for key, vector in items:
+            vectors[key] = vector
+            embedding_cache.set(key, vector)
+
+    return [vectors[key] for key in keys]
+
+
+# Identical questions asked at the same moment share one embedding request
+_query_flight = SingleFlight("query_embeddings")
+
+
+def embed_query(openai_client, text, model):
+    return _query_flight.do(
+        embedding_key(model, text),
+        lambda: embed_texts(openai_client, [text], model)[0]
+    )
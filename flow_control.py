@@ -0,0 +1,165 @@
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Per-upstream (max concurrent requests, sustained requests per second, burst),
+# shared by every session in the process, to stay under Google and OpenAI quotas
+UPSTREAM_LIMITS = {
+    "places": (4, 10, 20),
+    "photo": (8, 40, 80),
+    "weather": (4, 10, 20),
+    "openai_chat": (8, 8, 16),
+    "openai_embeddings": (4, 20, 40),
+    "openai_audio": (4, 5, 10),
+}
+DEFAULT_LIMIT = (4, 5, 10)
+
+# Longest a request waits for a slot or a token before giving up
+ACQUIRE_TIMEOUT = 15
+
+# Named single-flight groups and upstream limiters, for diagnostics
+_flights = {}
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class UpstreamBusyError(RuntimeError):
+    pass
+
+
+# Coalesces concurrent identical calls: the first caller for a key runs the
+# function, callers arriving while it is in flight wait and get the same result
+# (or exception) instead of making their own upstream request.
+class SingleFlight:
+    def __init__(self, name=None):
+        self.leaders = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+        if name is not None:
+            _flights[name] = self
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {"leaders": self.leaders, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+# Token bucket refilled continuously at `rate` tokens per second up to `capacity`
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Function to take one token, sleeping until one is available; False on timeout
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+# Concurrency cap plus rate limit for one upstream
+class UpstreamLimiter:
+    def __init__(self, name, max_concurrent, rate, burst):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, timeout=ACQUIRE_TIMEOUT):
+        started = time.monotonic()
+        if not self._semaphore.acquire(timeout=timeout):
+            raise UpstreamBusyError(f"{self.name}: no free request slot after {timeout}s")
+        try:
+            if not self.bucket.acquire(max(0.0, timeout - (time.monotonic() - started))):
+                raise UpstreamBusyError(f"{self.name}: rate limit still exhausted after {timeout}s")
+            waited = time.monotonic() - started
+            with self._lock:
+                self.in_flight += 1
+                self.wait_seconds += waited
+                if waited > 0.001:
+                    self.throttled += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+        finally:
+            self._semaphore.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "rate": self.bucket.rate,
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "wait_seconds": self.wait_seconds,
+            }
+
+
+def get_limiter(upstream):
+    with _limiters_lock:
+        if upstream not in _limiters:
+            _limiters[upstream] = UpstreamLimiter(upstream, *UPSTREAM_LIMITS.get(upstream, DEFAULT_LIMIT))
+        return _limiters[upstream]
+
+
+# Function to hold one request slot for an upstream:
+#     with limit("places"):
+#         response = session.get(...)
+def limit(upstream):
+    return get_limiter(upstream).slot()
+
+
+def flow_stats():
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {
+        "flights": {name: flight.stats() for name, flight in sorted(_flights.items())},
+        "upstreams": {name: limiter.stats() for name, limiter in sorted(limiters.items())},
+    }
@@ -0,0 +1,137 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from flow_control import limit
+from tracing import span
+
+# (connect, read) timeouts in seconds for each upstream
+ENDPOINT_TIMEOUTS = {
+    "places": (3.05, 10),
+    "photo": (3.05, 15),
+    "weather": (3.05, 5),
+}
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Bounded retry with exponential backoff for throttling and server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+
+# Consecutive failures before an upstream is short-circuited, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+# Circuit breaker that fails fast while an upstream keeps failing, then lets a
+# single trial request through once the reset timeout has passed
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_request(self):
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self._trial_in_flight):
+                raise CircuitOpenError(f"{self.name} is unavailable, retrying in a few seconds")
+            if state == "half-open":
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    # Function to give up a half-open trial that never reached the upstream,
+    # without counting it as a failure
+    def release_trial(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# Function to build the process-wide session with keep-alive pools per host
+def _build_session():
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = _build_session()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(endpoint):
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+
+# Function to GET from a named upstream with pooling, timeouts, retries, circuit
+# breaking, and the upstream's process-wide concurrency and rate limits
+def get(endpoint, url, params=None, **kwargs):
+    breaker = get_breaker(endpoint)
+    kwargs.setdefault("timeout", ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+    with span(f"http.{endpoint}") as current:
+        # The slot is taken before the breaker is consulted, so a request that
+        # times out waiting on the limiter never holds the half-open trial
+        with limit(endpoint):
+            breaker.before_request()
+            try:
+                response = _session.get(url, params=params, **kwargs)
+            except requests.exceptions.RequestException:
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release_trial()
+                raise
+        current.set(
+            status_code=response.status_code,
+            bytes_sent=len(response.request.url),
+            bytes_received=len(response.content),
+        )
+    if response.status_code in RETRY_STATUSES:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
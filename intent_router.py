@@ -0,0 +1,123 @@
+import logging
+import re
+from collections import namedtuple
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Decisions at or above this confidence skip the gpt-4o tool-selection call
+CONFIDENCE_THRESHOLD = 0.8
+
+# Past tool selections made by the model, keyed by normalized query
+ROUTE_CACHE_TTL = 24 * 60 * 60
+route_cache = TTLCache(maxsize=2048, ttl=ROUTE_CACHE_TTL, name="routes")
+
+RoutingDecision = namedtuple("RoutingDecision", ["calls", "confidence", "source"])
+
+# Gazetteer of cities travellers commonly search for
+KNOWN_CITIES = [
+    "Amsterdam", "Athens", "Atlanta", "Austin", "Bangalore", "Bangkok", "Barcelona", "Beijing",
+    "Berlin", "Boston", "Brussels", "Budapest", "Buenos Aires", "Cairo", "Cape Town", "Chennai",
+    "Chicago", "Copenhagen", "Dallas", "Delhi", "Denver", "Dubai", "Dublin", "Edinburgh",
+    "Florence", "Frankfurt", "Geneva", "Hanoi", "Hong Kong", "Honolulu", "Houston", "Hyderabad",
+    "Istanbul", "Jaipur", "Jakarta", "Kolkata", "Kuala Lumpur", "Kyoto", "Las Vegas", "Lisbon",
+    "London", "Los Angeles", "Madrid", "Manchester", "Melbourne", "Mexico City", "Miami", "Milan",
+    "Montreal", "Moscow", "Mumbai", "Munich", "Nashville", "New Delhi", "New Orleans", "New York",
+    "New York City", "Orlando", "Osaka", "Oslo", "Paris", "Philadelphia", "Phoenix", "Portland",
+    "Prague", "Rio de Janeiro", "Rome", "San Diego", "San Francisco", "Santiago", "Sao Paulo",
+    "Seattle", "Seoul", "Shanghai", "Singapore", "Stockholm", "Sydney", "Syracuse", "Taipei",
+    "Tokyo", "Toronto", "Vancouver", "Venice", "Vienna", "Warsaw", "Washington", "Washington DC",
+    "Zurich",
+]
+_CITIES = {city.lower(): city for city in KNOWN_CITIES}
+_LONGEST_CITY_WORDS = max(len(city.split()) for city in KNOWN_CITIES)
+
+# "<what> in/near/around <where>", e.g. "restaurants in Los Angeles"
+_WHAT_IN_WHERE = re.compile(r"^(?P<what>.+?)\s+(?:in|near|around|at)\s+(?P<where>[^,]+?)(?:\s*,\s*(?P<region>.+))?$", re.IGNORECASE)
+_WEATHER_ONLY = re.compile(r"^(?:the\s+)?(?:weather|forecast|temperature)$", re.IGNORECASE)
+
+# A <what> opening with one of these is a question or a request ("is it raining",
+# "how do i get to"), not a thing to search for; the model decides those
+_QUESTION_WORDS = frozenset("""
+is are was were will would what what's whats how when where why who which can could should
+do does did tell show find get give book any i i'm im me my it it's its
+""".split())
+# Words a search phrase does not start or end with ("flights from", "to the")
+_DANGLING_WORDS = frozenset("a an and at by for from in near of on or the to via with".split())
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+def _calls(what, location, query):
+    calls = [("get_Weather", {"location": location})]
+    if not _WEATHER_ONLY.match(what):
+        calls.append(("get_places_from_google", {"query": query}))
+    return calls
+
+
+# Function to tell whether <what> reads as a plain search phrase like "cheap sushi restaurants"
+def _is_search_phrase(what):
+    words = what.split()
+    return bool(words) and words[0] not in _QUESTION_WORDS | _DANGLING_WORDS and words[-1] not in _DANGLING_WORDS
+
+
+# Function to find a known city at the start or end of the query, e.g. "paris cafes"
+def _find_city_at_edge(words):
+    for size in range(min(_LONGEST_CITY_WORDS, len(words) - 1), 0, -1):
+        head, tail = " ".join(words[:size]), " ".join(words[-size:])
+        if head in _CITIES:
+            return _CITIES[head], " ".join(words[size:])
+        if tail in _CITIES:
+            return _CITIES[tail], " ".join(words[:-size])
+    return None, None
+
+
+# Function to pick tools and arguments locally from patterns and the gazetteer
+def _route_locally(query):
+    normalized = normalize_query(query)
+    match = _WHAT_IN_WHERE.match(normalized)
+    if match:
+        what, where, region = match.group("what"), match.group("where"), match.group("region")
+        location = _CITIES.get(where)
+        if location:
+            if region:
+                location = f"{location}, {region.upper() if len(region) <= 3 else region.title()}"
+            # A known city after a question is still a question; leave it to the model
+            confidence = 0.95 if _is_search_phrase(what) else 0.5
+            return RoutingDecision(_calls(what, location, query.strip()), confidence, "pattern")
+        # Unknown place names still match the shape of the sentence, but may be anything
+        return RoutingDecision(_calls(what, where.title(), query.strip()), 0.6, "pattern")
+
+    words = normalized.split()
+    if len(words) >= 2:
+        location, what = _find_city_at_edge(words)
+        if location and _is_search_phrase(what):
+            return RoutingDecision(_calls(what, location, f"{what} in {location}"), 0.85, "gazetteer")
+    return RoutingDecision([], 0.0, "none")
+
+
+# Function to route a query without the model when confident; returns a
+# RoutingDecision whose calls are (tool name, arguments) pairs, or None when
+# the model should decide
+def route_query(query):
+    cached = route_cache.get(normalize_query(query))
+    if cached is not None:
+        decision = RoutingDecision(cached, 1.0, "cache")
+    else:
+        decision = _route_locally(query)
+    confident = decision.confidence >= CONFIDENCE_THRESHOLD
+    logger.info(
+        "route %r -> %s (confidence %.2f, source %s, %s)",
+        query, decision.calls, decision.confidence, decision.source,
+        "local" if confident else "falling back to model",
+    )
+    return decision if confident else None
+
+
+# Function to remember the model's tool selection for a query
+def remember_route(query, calls):
+    if calls:
+        route_cache.set(normalize_query(query), calls)
@@ -0,0 +1,39 @@
+import hashlib
+import json
+
+from cache import TTLCache
+
+# Bump when the itinerary prompt changes so old answers are not reused
+ITINERARY_PROMPT_VERSION = 2
+
+# Itineraries shared across sessions, keyed by their canonical inputs
+SHARE_ACROSS_SESSIONS = True
+ITINERARY_CACHE_TTL = 24 * 60 * 60
+shared_itinerary_cache = TTLCache(maxsize=512, ttl=ITINERARY_CACHE_TTL, name="itineraries")
+
+
+# Function to build a canonical key from (sorted bucket, date, model, prompt version)
+def itinerary_key(bucket, travel_date, model, prompt_version=ITINERARY_PROMPT_VERSION):
+    canonical = json.dumps({
+        "bucket": sorted(place.get("place_id") or place["name"] for place in bucket),
+        "date": travel_date.isoformat() if travel_date else None,
+        "model": model,
+        "prompt": prompt_version,
+    }, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# Function to look an itinerary up in the session's cache, then the shared one
+def lookup_itinerary(session_cache, key):
+    itinerary = session_cache.get(key)
+    if itinerary is None and SHARE_ACROSS_SESSIONS:
+        itinerary = shared_itinerary_cache.get(key)
+        if itinerary is not None:
+            session_cache[key] = itinerary
+    return itinerary
+
+
+def store_itinerary(session_cache, key, itinerary):
+    session_cache[key] = itinerary
+    if SHARE_ACROSS_SESSIONS:
+        shared_itinerary_cache.set(key, itinerary)
@@ -1,9 +1,16 @@
 import streamlit as st
-import requests
-from openai import OpenAI
 import json
 import time
 
+from flow_control import limit
+from intent_router import remember_route, route_query
+from places import iter_places
+from resources import get_openai_client
+from streaming import openai_deltas, render_stream
+from tool_dispatch import parse_tool_calls, run_tool_calls
+from tracing import record_usage, span
+from weather import get_weather, weather_bucket, advice_cache
+
 # Initialize session state for chat history and search history
 if 'search_history' not in st.session_state:
     st.session_state['search_history'] = []
@@ -23,6 +30,8 @@ with st.sidebar:
 # API keys
 api_key = st.secrets["api_key"]
 openai_api_key = st.secrets["key1"]
+open_weather_api_key = st.secrets['OpenWeatherAPIkey']
+openai_client = get_openai_client(openai_api_key)
 
 tools = [
     {
@@ -63,34 +72,14 @@ tools = [
 
 # Weather data function
 def get_Weather(location, API_key):
-    if "," in location:
-        location = location.split(",")[0].strip()
-
-    urlbase = "https://api.openweathermap.org/data/2.5/"
-    urlweather = f"weather?q={location}&appid={API_key}"
-    url = urlbase + urlweather
-    response = requests.get(url)
-    data = response.json()
-    
-    return data
-
-# Function to fetch places from Google Places API
+    return get_weather(location, API_key)
+
+# Function to fetch places from Google Places API. Returns the first batch of
+# filtered results and an iterator over later batches, or an error dict.
 def fetch_places_from_google(query):
-    base_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {
-        "query": query,
-        "key": api_key
-    }
+    batches = iter_places(query, api_key, min_rating, max_results)
     try:
-        response = requests.get(base_url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            results = data.get("results", [])
-            # Filter by minimum rating and limit results
-            filtered_results = [place for place in results if place.get("rating", 0) >= min_rating]
-            return filtered_results[:max_results]
-        else:
-            return {"error": f"API error {response.status_code}: {response.text}"}
+        return next(batches, []), batches
     except Exception as e:
         return {"error": str(e)}
 
@@ -98,81 +87,130 @@ def fetch_places_from_google(query):
 # Function for interacting with OpenAI's API
 def chat_completion_request(messages):
     try:
-        client = OpenAI(api_key=openai_api_key)
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
-        )
+        with span("openai.chat", model="gpt-4o", purpose="tool selection"), limit("openai_chat"):
+            response = openai_client.chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                tools=tools,
+                tool_choice="auto",
+            )
+        record_usage("gpt-4o", response.usage)
         return response
     except Exception as e:
         st.error(f"Error generating response: {e}")
         return None
 
 
-# Handle function calls from GPT response
-def handle_tool_calls(tool_call):
-    arguments = {}
-    if len(tool_call) == 2:
-        for tool in tool_call:
-            arguments.update(json.loads(tool.function.arguments))
+# Tool handlers: fetchers run concurrently on worker threads, renderers run on the script thread
+def fetch_weather_tool(arguments):
+    location = arguments.get("location")
+    if not location:
+        return None
+    weather_data = get_Weather(location, open_weather_api_key)
+    bucket = weather_bucket(location, weather_data)
+    advice = advice_cache.get(bucket) if bucket else None
+    if advice is not None:
+        return bucket, advice
+    messages = [
+        {"role": "user", "content": "Explain in normal English in few words including what kind of clothing can be worn and what tips need to be taken based on the following weather data."},
+        {"role": "user", "content": json.dumps(weather_data)}
+    ]
+    # Open the summary stream here so its first token overlaps with the other tools
+    with limit("openai_chat"):
+        stream = openai_client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            stream = True,
+            stream_options={"include_usage": True}
+        )
+    return bucket, stream
+
+
+def render_weather_tool(arguments, value):
+    if not value:
+        return
+    bucket, stream = value
+    if isinstance(stream, str):
+        st.markdown(stream)
+        return
+    full_response = render_stream(openai_deltas(stream), st.empty(), label="weather_advice").text
+    if bucket and full_response:
+        advice_cache.set(bucket, full_response)
+
+
+def fetch_places_tool(arguments):
+    query = arguments.get("query")
+    if not query:
+        return None
+    return fetch_places_from_google(query)
+
+
+def render_places_tool(arguments, places_data):
+    if places_data is None:
+        return
+    if isinstance(places_data, dict) and "error" in places_data:
+        st.error(f"Error: {places_data['error']}")
+        return
+    first_batch, more_batches = places_data
+    if not first_batch:
+        st.warning("No places found matching your criteria.")
     else:
-        tool_call_data = tool_call[0]
-        arguments = json.loads(tool_call_data.function.arguments)
-    weather_data, places_data = None, None
-
-    if 'location' in arguments:
-            location = arguments.get("location")
-            if location:
-                st.markdown(f"Fetching weather for: **{location}**")
-                open_api_key = st.secrets['OpenWeatherAPIkey']
-                weather_data = get_Weather(location, open_api_key)
-                messages = [
-                    {"role": "user", "content": "Explain in normal English in few words including what kind of clothing can be worn and what tips need to be taken based on the following weather data."},
-                    {"role": "user", "content": json.dumps(weather_data)}
-                ]
-                client = OpenAI(api_key=openai_api_key)
-                stream = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages,
-                    stream = True
-                )
-                location = ''
-                message_placeholder = st.empty()
-                full_response = ""
-                if stream:
-                    for chunk in stream:
-                        if chunk.choices[0].delta.content is not None:
-                            full_response += chunk.choices[0].delta.content
-                            message_placeholder.markdown(full_response + "▌")
-                    message_placeholder.markdown(full_response)
-                
-        # Process get_places_from_google if provided
-    if 'query' in arguments:
-            query = arguments.get("query")
-            if query:
-                st.markdown(f"Searching for: **{query}**")
-                places_data = fetch_places_from_google(query)
-                query = ''
-                if isinstance(places_data, dict) and "error" in places_data:
-                    st.error(f"Error: {places_data['error']}")
-                elif not places_data:
-                    st.warning("No places found matching your criteria.")
-                else:
-                    st.markdown("### 📍 Top Recommendations")
-                    for idx, place in enumerate(places_data):
-                        with st.expander(f"{idx + 1}. {place.get('name', 'No Name')}"):
-                            st.write(f"📍 **Address**: {place.get('formatted_address', 'No address available')}")
-                            st.write(f"🌟 **Rating**: {place.get('rating', 'N/A')} (Based on {place.get('user_ratings_total', 'N/A')} reviews)")
-                            st.write(f"💲 **Price Level**: {place.get('price_level', 'N/A')}")
-                            if "photos" in place:
-                                photo_ref = place["photos"][0]["photo_reference"]
-                                photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_ref}&key={api_key}"
-                                st.image(photo_url, caption=place.get("name", "Photo"), use_column_width=True)
-                            lat, lng = place["geometry"]["location"].values()
-                            map_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
-                            st.markdown(f"[📍 View on Map]({map_url})", unsafe_allow_html=True)
+        st.markdown("### 📍 Top Recommendations")
+        display_places(first_batch)
+        # Later result pages are rendered as they arrive
+        start = len(first_batch)
+        try:
+            for batch in more_batches:
+                display_places(batch, start)
+                start += len(batch)
+        except Exception as e:
+            st.warning(f"Could not load more places: {e}")
+
+
+def display_places(places, start=0):
+    for idx, place in enumerate(places, start=start):
+        with st.expander(f"{idx + 1}. {place.get('name', 'No Name')}"):
+            st.write(f"📍 **Address**: {place.get('formatted_address', 'No address available')}")
+            st.write(f"🌟 **Rating**: {place.get('rating', 'N/A')} (Based on {place.get('user_ratings_total', 'N/A')} reviews)")
+            st.write(f"💲 **Price Level**: {place.get('price_level', 'N/A')}")
+            if "photos" in place:
+                photo_ref = place["photos"][0]["photo_reference"]
+                photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_ref}&key={api_key}"
+                st.image(photo_url, caption=place.get("name", "Photo"), use_column_width=True)
+            lat, lng = place["geometry"]["location"].values()
+            map_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
+            st.markdown(f"[📍 View on Map]({map_url})", unsafe_allow_html=True)
+
+
+TOOL_HANDLERS = {
+    "get_Weather": fetch_weather_tool,
+    "get_places_from_google": fetch_places_tool,
+}
+TOOL_RENDERERS = {
+    "get_Weather": render_weather_tool,
+    "get_places_from_google": render_places_tool,
+}
+
+
+# Handle (tool name, arguments) calls chosen by the local router or by GPT
+def handle_tool_calls(calls):
+
+    # One slot per call keeps the layout stable while results arrive out of order
+    slots = []
+    for name, arguments in calls:
+        slot = st.container()
+        if name == "get_Weather" and arguments.get("location"):
+            slot.markdown(f"Fetching weather for: **{arguments['location']}**")
+        elif name == "get_places_from_google" and arguments.get("query"):
+            slot.markdown(f"Searching for: **{arguments['query']}**")
+        slots.append(slot)
+
+    for result in run_tool_calls(calls, TOOL_HANDLERS):
+        with slots[result.index]:
+            if result.error is not None:
+                st.error(f"Error: {result.error}")
+            else:
+                TOOL_RENDERERS[result.name](result.arguments, result.value)
 
         
 # handle user input
@@ -181,19 +219,26 @@ user_query = st.text_input("🔍 What are you looking for? (e.g., 'restaurants i
 if user_query:
     if user_query not in st.session_state["search_history"]:
         st.session_state["search_history"].append(user_query)
-    user_query = user_query + " and tell me the weather at this place"
-    message = {"role": "user", "content": user_query}
-
-    # Get response from OpenAI
-    with st.spinner("Generating response..."):
-        response = chat_completion_request([message])
 
-    if response:
-        tool_call = response.choices[0].message.tool_calls
-        
-        # Handle function call from GPT
-        if tool_call:
-            handle_tool_calls(tool_call)
-        else:
-            with st.chat_message("assistant"):
-                st.markdown(response_message.content)
+    # Most queries name a place and a city, so try routing them without the model
+    decision = route_query(user_query)
+    if decision:
+        handle_tool_calls(decision.calls)
+    else:
+        message = {"role": "user", "content": user_query + " and tell me the weather at this place"}
+
+        # Get response from OpenAI
+        with st.spinner("Generating response..."):
+            response = chat_completion_request([message])
+
+        if response:
+            tool_call = response.choices[0].message.tool_calls
+
+            # Handle function call from GPT
+            if tool_call:
+                calls = parse_tool_calls(tool_call)
+                remember_route(user_query, calls)
+                handle_tool_calls(calls)
+            else:
+                with st.chat_message("assistant"):
+                    st.markdown(response.choices[0].message.content)
@@ -1,56 +1,45 @@
 import streamlit as st
-import requests
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.schema import HumanMessage
 from datetime import date
-from PIL import Image
-import io
+import time
 
-# Function to fetch places from Google Places API
+from places import iter_places
+from resources import get_chat_llm
+from itinerary_cache import itinerary_key, lookup_itinerary, store_itinerary
+from route_planner import build_schedule, format_schedule
+from streaming import langchain_deltas, render_stream
+from thumbnails import get_thumbnails
+
+# Function to fetch places from Google Places API. Returns the first batch of
+# filtered results and an iterator over later batches, or an error dict.
 def fetch_places_from_google(query):
-    base_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {"query": query, "key": api_key}
+    batches = iter_places(query, api_key, min_rating, max_results)
     try:
-        response = requests.get(base_url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            results = data.get("results", [])
-            # Filter by minimum rating and limit results
-            filtered_results = [place for place in results if place.get("rating", 0) >= min_rating]
-            return filtered_results[:max_results]
-        else:
-            return {"error": f"API error {response.status_code}: {response.text}"}
+        return next(batches, []), batches
     except Exception as e:
         return {"error": str(e)}
 
-# Helper function to resize images
-def fetch_and_resize_image(url, size=(200, 200)):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        img = Image.open(io.BytesIO(response.content))
-        img = img.resize(size)  # Resize to uniform dimensions
-        return img
-    except Exception as e:
-        return None  # Return None if fetching or resizing fails
+def bucket_names():
+    return [place["name"] for place in st.session_state['itinerary_bucket']]
 
 # Display places in 3x3 grid layout with uniform image sizes and consistent spacing
-def display_places_grid(places):
+def display_places_grid(places, start=0):
+    # Fetch every thumbnail in parallel before laying out the grid
+    photo_refs = [place["photos"][0]["photo_reference"] for place in places if "photos" in place]
+    thumbnails = get_thumbnails(photo_refs, api_key, size=(200, 200))  # Set uniform size
+
     cols = st.columns(3, gap="medium")  # Adjust gap for spacing between columns
-    for idx, place in enumerate(places):
-        with cols[idx % 3]:  # Distribute places evenly across 3 columns
+    for idx, place in enumerate(places, start=start):
+        with cols[(idx - start) % 3]:  # Distribute places evenly across 3 columns
             name = place.get("name", "No Name")
             lat, lng = place["geometry"]["location"].values()
             map_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
-            photo_url = None
+            photo_ref = None
             if "photos" in place:
                 photo_ref = place["photos"][0]["photo_reference"]
-                photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_ref}&key={api_key}"
 
-            # Fetch and display image
-            if photo_url:
-                img = fetch_and_resize_image(photo_url, size=(200, 200))  # Set uniform size
+            # Display image
+            if photo_ref:
+                img = thumbnails.get(photo_ref)
                 if img:
                     st.image(img, caption=name, use_column_width=False)
                 else:
@@ -61,17 +50,25 @@ def display_places_grid(places):
             # Link to map
             st.markdown(f"[📍 View on Map]({map_url})", unsafe_allow_html=True)
             
-            # Manage itinerary bucket
-            if name in st.session_state['itinerary_bucket']:
+            # Manage itinerary bucket; coordinates are kept for route planning
+            if name in bucket_names():
                 st.button("Added", disabled=True, key=f"added_{idx}")
             else:
                 if st.button("Add to Itinerary", key=f"add_{idx}"):
-                    st.session_state['itinerary_bucket'].append(name)
+                    st.session_state['itinerary_bucket'].append({
+                        "name": name,
+                        "place_id": place.get("place_id"),
+                        "lat": lat,
+                        "lng": lng,
+                    })
 
         # Add vertical spacing between rows
-        if (idx + 1) % 3 == 0:  # After every 3 places
+        if (idx - start + 1) % 3 == 0:  # After every 3 places
             st.write("")  # Empty line for spacing between rows
 
+def current_itinerary_key():
+    return itinerary_key(st.session_state['itinerary_bucket'], selected_date, ITINERARY_MODEL)
+
 # Function to generate an itinerary using LangChain
 def plan_itinerary_with_langchain():
     if not st.session_state['itinerary_bucket']:
@@ -79,34 +76,54 @@ def plan_itinerary_with_langchain():
         return
 
     st.markdown("### 🗺️ AI-Generated Itinerary")
-    places_list = "\n".join(st.session_state['itinerary_bucket'])
+    # Visit order and leg times are computed locally; the LLM only describes them
+    schedule = format_schedule(build_schedule(st.session_state['itinerary_bucket']))
 
     if selected_date:
         st.info(f"Planning itinerary for {selected_date.strftime('%A, %B %d, %Y')} 🎉")
     else:
         st.info("No specific date chosen. Starting from 9:00 AM by default.")
 
+    # LangChain is only loaded once an itinerary is actually requested
+    from langchain.prompts import PromptTemplate
+    from langchain.schema import HumanMessage
+
     prompt_template = PromptTemplate(
-        input_variables=["places", "date"],
-        template="""Plan a travel itinerary for the following places:
-        {places}
+        input_variables=["schedule", "date"],
+        template="""Describe this travel itinerary. The visit order, times and transportation are already planned, do not change them:
+        {schedule}
         Date of travel: {date}
-        Provide a detailed plan including the best order to visit, time at each location, transportation time, and meal breaks.
+        For each stop, briefly suggest what to see or do, and mention the meal breaks.
         """
     )
 
+    # An unchanged bucket and date render the stored itinerary without calling the LLM
+    key = current_itinerary_key()
+    itinerary = lookup_itinerary(st.session_state['itinerary_cache'], key)
+    if itinerary is not None:
+        st.session_state['itinerary_key'] = key
+        st.markdown(itinerary)
+        return
+
     date_str = selected_date.strftime('%A, %B %d, %Y') if selected_date else "Not specified"
-    formatted_prompt = prompt_template.format(places=places_list, date=date_str)
+    formatted_prompt = prompt_template.format(schedule=schedule, date=date_str)
 
-    with st.spinner("Generating your itinerary..."):
-        response = llm([HumanMessage(content=formatted_prompt)])
-        st.markdown(response.content)
+    # Stream the itinerary as it is written instead of waiting behind a spinner
+    started = time.perf_counter()
+    llm = get_chat_llm(ITINERARY_MODEL, 0.3, openai_api_key)
+    chunks = llm.stream([HumanMessage(content=formatted_prompt)])
+    itinerary = render_stream(langchain_deltas(chunks), st.empty(), label="itinerary", started=started).text
+    store_itinerary(st.session_state['itinerary_cache'], key, itinerary)
+    st.session_state['itinerary_key'] = key
 
 # Initialize session state for itinerary bucket and search history
 if 'itinerary_bucket' not in st.session_state:
     st.session_state['itinerary_bucket'] = []
 if 'search_history' not in st.session_state:
     st.session_state['search_history'] = []
+if 'itinerary_cache' not in st.session_state:
+    st.session_state['itinerary_cache'] = {}
+    st.session_state['itinerary_key'] = None
 
 # Streamlit app title and sidebar filters
 st.title("🌍 **Travel Planner with AI** ✈️")
@@ -125,8 +142,8 @@ with st.sidebar:
 api_key = st.secrets["api_key"]
 openai_api_key = st.secrets["openai_api_key"]
 
-# Initialize LangChain ChatOpenAI model
-llm = ChatOpenAI(temperature=0.3, model="gpt-4o-mini", openai_api_key=openai_api_key, verbose=True)
+# Model for the shared LangChain ChatOpenAI client, created on first use
+ITINERARY_MODEL = "gpt-4o-mini"
 
 # Handle search input
 user_query = st.text_input("🔍 Search for places (e.g., 'restaurants in Paris'):", value=selected_query)
@@ -141,10 +158,19 @@ if user_query:
 
     if isinstance(places_data, dict) and "error" in places_data:
         st.error(f"Error: {places_data['error']}")
-    elif not places_data:
+    elif not places_data[0]:
         st.warning("No places found matching your criteria.")
     else:
-        display_places_grid(places_data)
+        first_batch, more_batches = places_data
+        display_places_grid(first_batch)
+        # Later result pages are added to the grid as they arrive
+        start = len(first_batch)
+        try:
+            for batch in more_batches:
+                display_places_grid(batch, start)
+                start += len(batch)
+        except Exception as e:
+            st.warning(f"Could not load more places: {e}")
 
     # Show itinerary bucket
     # Show itinerary bucket
@@ -158,14 +184,19 @@ if user_query:
         for place in st.session_state['itinerary_bucket']:
             col1, col2 = st.columns([3, 1])
             with col1:
-                st.write(place)
+                st.write(place["name"])
             with col2:
-                if st.button("Remove", key=f"remove_{place}"):
+                if st.button("Remove", key=f"remove_{place['place_id'] or place['name']}"):
                     st.session_state['itinerary_bucket'].remove(place)
     
     else:
         st.write("Your itinerary bucket is empty.")
 
-    # Generate itinerary button
-    if st.button("Generate AI Itinerary"):
+    # A changed bucket or date invalidates this session's stored itinerary
+    if st.session_state['itinerary_key'] not in (None, current_itinerary_key()):
+        st.session_state['itinerary_cache'] = {}
+        st.session_state['itinerary_key'] = None
+
+    # Generate itinerary button; a generated itinerary stays on the page across other clicks
+    if st.button("Generate AI Itinerary") or st.session_state['itinerary_key']:
         plan_itinerary_with_langchain()
@@ -1,28 +1,17 @@
 # page3-whisper.py
 import streamlit as st
-from openai import OpenAI
-import os
+import streamlit.components.v1 as components
 from audio_recorder_streamlit import audio_recorder
 import base64
-import time
-
-# Dictionary of countries and their primary languages
-COUNTRY_LANGUAGES = {
-    "Spain": "Spanish",
-    "France": "French",
-    "Germany": "German",
-    "Italy": "Italian",
-    "Japan": "Japanese",
-    "China": "Chinese",
-    "Brazil": "Portuguese",
-    "North India": "Hindi",
-    "Telangana / Andhra Pradesh": "Telugu",
-}
-
-# Setup OpenAI client
-if 'openai_client' not in st.session_state:
-    api_key = st.secrets["openai_api_key"]
-    st.session_state.openai_client = OpenAI(api_key=api_key)
+import uuid
+
+from audio_store import get_store as get_audio_store, load_audio
+from resources import get_openai_client
+from translation import COUNTRY_LANGUAGES, translate
+from voice_pipeline import run_voice_pipeline, transcribe_bytes
+
+# Shared OpenAI client
+openai_client = get_openai_client(st.secrets["openai_api_key"])
 
 # Initialize session state
 if 'messages' not in st.session_state:
@@ -31,59 +20,52 @@ if 'last_recorded_audio' not in st.session_state:
     st.session_state.last_recorded_audio = None
 if 'target_language' not in st.session_state:
     st.session_state.target_language = None
-
-# Function to transcribe audio
-def transcribe_audio(audio_path):
-    with open(audio_path, "rb") as audio_file:
-        transcript = st.session_state.openai_client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file
-        )
-        return transcript.text
-
-# Function to convert text to audio
-def text_to_audio(text, audio_path, voice="nova"):
-    response = st.session_state.openai_client.audio.speech.create(
-        model="tts-1",
-        voice=voice,
-        input=text
-    )
-    response.stream_to_file(audio_path)
-
-# Function to play audio
-def auto_play_audio(audio_file):
-    if os.path.exists(audio_file):
-        with open(audio_file, "rb") as f:
-            audio_bytes = f.read()
-        base64_audio = base64.b64encode(audio_bytes).decode("utf-8")
-        audio_html = f'<audio src="data:audio/mp3;base64,{base64_audio}" controls autoplay>'
-        st.markdown(audio_html, unsafe_allow_html=True)
-
-# Function to translate text
+if 'audio_session_id' not in st.session_state:
+    st.session_state.audio_session_id = uuid.uuid4().hex
+
+# Function to transcribe recorded audio bytes
+def transcribe_audio(audio_bytes):
+    return transcribe_bytes(openai_client, audio_bytes)
+
+# Function to play audio. st.audio hands the clip to Streamlit's media server,
+# so the page only carries a URL and the browser fetches it when played.
+def play_audio(audio_key, autoplay=False):
+    audio_bytes = load_audio(audio_key)
+    if audio_bytes is not None:
+        st.audio(audio_bytes, format="audio/mp3", autoplay=autoplay)
+
+# Function to queue a sentence clip for gapless playback. The queue lives on the
+# parent window so clips rendered by separate components play one after another.
+def queue_audio(audio_key):
+    audio_bytes = load_audio(audio_key)
+    if audio_bytes is None:
+        return
+    base64_audio = base64.b64encode(audio_bytes).decode("utf-8")
+    components.html(f"""<script>
+        const host = window.parent;
+        host.ttsQueue = host.ttsQueue || [];
+        host.ttsQueue.push("data:audio/mp3;base64,{base64_audio}");
+        if (!host.ttsPlaying) {{
+            const playNext = () => {{
+                const src = host.ttsQueue.shift();
+                host.ttsPlaying = Boolean(src);
+                if (!src) return;
+                const audio = new host.Audio(src);
+                audio.onended = playNext;
+                audio.onerror = playNext;
+                audio.play().catch(playNext);
+            }};
+            playNext();
+        }}
+    </script>""", height=0)
+
+# Function to translate text; phrasebook and cached translations skip the model
 def translate_text(text, target_language):
-    messages = [
-        {"role": "system", "content": f"You are a translator. Translate the following text to {target_language}. Maintain the tone and meaning of the original text. Only respond with the translation, no additional text. Also, do not talk too fast"},
-        {"role": "user", "content": text}
-    ]
-    
-    response = st.session_state.openai_client.chat.completions.create(
-        model="gpt-4",
-        messages=messages,
-        temperature=0.75
-    )
-    
-    return response.choices[0].message.content
+    return translate(openai_client, text, target_language)
 
-# Function to process input
-def process_input(text, target_language, is_voice=False):
-    translated_text = translate_text(text, target_language)
-    
-    if is_voice:
-        audio_file = f"audio_response_{int(time.time())}.mp3"
-        text_to_audio(translated_text, audio_file)
-        return translated_text, audio_file
-    
-    return translated_text, None
+# Function to process typed input; spoken input goes through run_voice_pipeline
+def process_input(text, target_language):
+    return translate_text(text, target_language)
 
 # Main page content
 st.title("Travel Translation Assistant")
@@ -111,7 +93,14 @@ with chat_container:
             if "translation" in message:
                 st.write(f"🔄 {message['translation']}")
             if "audio" in message:
-                auto_play_audio(message["audio"])
+                # New replies were already played sentence by sentence as they streamed
+                play_audio(message["audio"], autoplay=False)
+
+# Keep this session's clips from being evicted while they are in the history
+get_audio_store().retain(
+    st.session_state.audio_session_id,
+    [message["audio"] for message in st.session_state.messages if "audio" in message]
+)
 
 # Voice and text input
 col1, col2 = st.columns([8, 2])
@@ -129,7 +118,7 @@ with col1:
 
 # Handle text input
 if text_input:
-    translation, _ = process_input(text_input, st.session_state.target_language)
+    translation = process_input(text_input, st.session_state.target_language)
     
     st.session_state.messages.append({
         "role": "user",
@@ -142,28 +131,28 @@ if text_input:
 if recorded_audio is not None and recorded_audio != st.session_state.last_recorded_audio:
     st.session_state.last_recorded_audio = recorded_audio
     
-    # Save and transcribe audio
-    audio_file = f"audio_input_{int(time.time())}.mp3"
-    with open(audio_file, "wb") as f:
-        f.write(recorded_audio)
-
-    # Transcribe the audio
-    transcribed_text = transcribe_audio(audio_file)
-    os.remove(audio_file)
-
-    # Get translation and audio response
-    translation, response_audio = process_input(
-        transcribed_text, 
-        st.session_state.target_language, 
-        is_voice=True
-    )
-
-    # Update chat history
-    st.session_state.messages.append({
+    # Transcribe the audio straight from memory
+    transcribed_text = transcribe_audio(recorded_audio)
+
+    # Stream the translation and play each sentence as soon as its audio is ready
+    with chat_container:
+        with st.chat_message("user"):
+            st.write(f"🎤 {transcribed_text}")
+            translation_placeholder = st.empty()
+            for event, value in run_voice_pipeline(openai_client, transcribed_text, st.session_state.target_language):
+                if event == "text":
+                    translation_placeholder.write(f"🔄 {value}")
+                elif event == "audio":
+                    queue_audio(value)
+                else:
+                    translation, response_audio = value
+
+    # Update chat history; the response has already been played
+    message = {
         "role": "user",
         "content": f"🎤 {transcribed_text}",
         "translation": translation,
-        "audio": response_audio
-    })
-    
-    st.rerun()
+    }
+    if response_audio:
+        message["audio"] = response_audio
+    st.session_state.messages.append(message)
@@ -1,94 +1,69 @@
 import streamlit as st
-from openai import OpenAI
-import os
-from PyPDF2 import PdfReader
-__import__('pysqlite3')
-import sys
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+import time
 
-import chromadb
+from conversation import ConversationMemory
+from embedding_cache import EMBEDDING_MODEL
+from flow_control import limit
+from resources import get_lexical_index, get_openai_client, get_vector_collection, knowledge_base_ready
+from retrieval import hybrid_search
+from streaming import openai_deltas, render_stream
 
-# Initialize OpenAI client
-if 'openai_client' not in st.session_state:
-    api_key = st.secrets['key1']
-    st.session_state.openai_client = OpenAI(api_key=api_key)
-
-# Function to add PDF content to ChromaDB collection
-def add_to_collection(collection, text, filename):
-    openai_client = st.session_state.openai_client
-    response = openai_client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    embedding = response.data[0].embedding
-    collection.add(
-        documents=[text],
-        ids=[filename],
-        embeddings=[embedding]
-    )
-    return collection
+# Shared OpenAI client
+api_key = st.secrets['key1']
+openai_client = get_openai_client(api_key)
 
 # Function to set up VectorDB if not already created
 def setup_vectordb():
     if 'travelfaq_vectorDB' not in st.session_state:
-        client = chromadb.PersistentClient()
-        collection = client.get_or_create_collection(
-            name="travelfaq_collection",
-            metadata={"hnsw:space": "cosine", "hnsw:M": 32}
-        )
-        
-        datafiles_path = os.path.join(os.getcwd(), "datafiles")
-        pdf_files = [f for f in os.listdir(datafiles_path) if f.endswith('.pdf')]
-        
-        for pdf_file in pdf_files:
-            file_path = os.path.join(datafiles_path, pdf_file)
-            with open(file_path, 'rb') as file:
-                pdf_reader = PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                collection = add_to_collection(collection, text, pdf_file)
-        
-        st.session_state.travelfaq_vectorDB = collection
+        # The collection is opened and synced once per process, in the background
+        # from server boot, and shared by every session
+        if knowledge_base_ready(api_key):
+            st.session_state.travelfaq_vectorDB = get_vector_collection(api_key)
+        else:
+            with st.spinner("Preparing the travel knowledge base..."):
+                st.session_state.travelfaq_vectorDB = get_vector_collection(api_key)
         st.success(f"Welcome to Trip Assistor")
     else:
         st.info("Welcome to Trip Assistor Dear!!")
 
-# Function to query the VectorDB and retrieve relevant documents
-def query_vectordb(query, k=3):
+# Function to retrieve relevant chunks. Questions that share exact terms with
+# the documents are answered from the BM25 index without an embedding call;
+# the rest fuse lexical and vector rankings.
+def query_vectordb(query, k=4):
     if 'travelfaq_vectorDB' in st.session_state:
         collection = st.session_state.travelfaq_vectorDB
-        openai_client = st.session_state.openai_client
-        response = openai_client.embeddings.create(
-            input=query,
-            model="text-embedding-3-small"
-        )
-        query_embedding = response.data[0].embedding
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            include=['documents', 'distances', 'metadatas'],
-            n_results=k
-        )
-        return results
+        chunks, _ = hybrid_search(collection, get_lexical_index(api_key), openai_client, query, EMBEDDING_MODEL, k)
+        return chunks
     else:
         st.error("VectorDB not set up. Please set up the VectorDB first.")
         return None
 
-# Function to get a response from OpenAI using the retrieved context
-def get_ai_response(query, context):
-    openai_client = st.session_state.openai_client
+# Function to label a retrieved chunk with its source page; rows stored without
+# metadata still render
+def format_chunk(chunk):
+    metadata = chunk.metadata or {}
+    return f"[{metadata.get('source')}, page {metadata.get('page')}] {chunk.text}"
+
+# Function to stream a response from OpenAI using the retrieved context into a placeholder
+def get_ai_response(query, context, placeholder):
+    # Earlier turns are trimmed to the memory's token budget; retrieved context
+    # is only sent with the current question, never stored in the history
+    history = st.session_state.messages[:-1]
     messages = [
-        {"role": "system", "content": "You are a helpful assistant with knowledge about the trips and safety of people! You politely answer the questions."},
-        {"role": "user", "content": f"Context: {context}\n\nQuestion: {query}"}
+        {"role": "system", "content": "You are a helpful assistant with knowledge about the trips and safety of people! You politely answer the questions."}
     ]
-    for msg in st.session_state.messages:
-        messages.append(msg)
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        max_tokens=150
-    )
-    return response.choices[0].message.content
+    messages.extend(st.session_state.conversation_memory.build_messages(history))
+    messages.append({"role": "user", "content": f"Context: {context}\n\nQuestion: {query}"})
+    started = time.perf_counter()
+    with limit("openai_chat"):
+        stream = openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=150,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+    return render_stream(openai_deltas(stream), placeholder, label="assistant", started=started).text
 
 # Main Streamlit app
 st.title("Your Trip Assistant")
@@ -99,6 +74,8 @@ setup_vectordb()
 # Initialize chat history if not already in session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "conversation_memory" not in st.session_state:
+    st.session_state.conversation_memory = ConversationMemory()
 
 # Display chat history
 for message in st.session_state.messages:
@@ -111,23 +88,24 @@ if prompt := st.chat_input("Hello Travelor, How can I help you?"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Query VectorDB for relevant documents
-    results = query_vectordb(prompt)
-    
-    # Set a distance threshold (adjust as needed)
-    DISTANCE_THRESHOLD = 0.7
-    
-    if results and results['documents'][0] and results['distances'][0][0] < DISTANCE_THRESHOLD:
-        # Retrieve document content from the vector DB and use it as context
-        context = " ".join([doc for doc in results['documents'][0]])
-        response = get_ai_response(prompt, context)
+    # Query VectorDB for relevant documents; only chunks that clear the lexical
+    # or vector relevance bar come back
+    chunks = query_vectordb(prompt)
+
+    if chunks:
+        # Use the retrieved chunks as context, labelled with their source page
+        context = "\n\n".join(
+            format_chunk(chunk) for chunk in chunks
+        )
         # Indicate that the bot is using context from the RAG pipeline
-        st.session_state.messages.append({"role": "system", "content": response})
         with st.chat_message("system"):
-            st.markdown(response)
+            response = get_ai_response(prompt, context, st.empty())
+        st.session_state.messages.append({"role": "system", "content": response})
     else:
         # If no relevant documents were found, generate response without document context
-        response = get_ai_response(prompt, "")
-        st.session_state.messages.append({"role": "system", "content":response})
         with st.chat_message("system"):
-            st.markdown(response)
+            response = get_ai_response(prompt, "", st.empty())
+        st.session_state.messages.append({"role": "system", "content":response})
+
+    # Fold older turns into the summary now that the reply is out, off the request path
+    st.session_state.conversation_memory.fold_in_background(openai_client, st.session_state.messages)
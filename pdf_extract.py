@@ -0,0 +1,78 @@
+import logging
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz  # PyMuPDF < 1.24
+    except ImportError:
+        fitz = None
+
+# Batches smaller than this (in total file size) are parsed inline; starting
+# spawned workers costs a few hundred ms, more than parsing a few small PDFs
+MIN_BYTES_FOR_POOL = 16 * 1024 * 1024
+
+ExtractionResult = namedtuple("ExtractionResult", ["path", "pages", "seconds", "backend"])
+
+
+def _iter_pages_pymupdf(file_path):
+    with fitz.open(file_path) as document:
+        for page in document:
+            yield page.get_text()
+
+
+def _iter_pages_pypdf2(file_path):
+    from PyPDF2 import PdfReader
+    with open(file_path, 'rb') as file:
+        pdf_reader = PdfReader(file)
+        for page in pdf_reader.pages:
+            yield page.extract_text() or ""
+
+
+# Extraction backends in order of preference
+BACKENDS = {"pymupdf": _iter_pages_pymupdf, "pypdf2": _iter_pages_pypdf2}
+
+
+def default_backend():
+    return "pymupdf" if fitz is not None else "pypdf2"
+
+
+# Function to stream the text of a PDF one page at a time
+def iter_pages(file_path, backend=None):
+    return BACKENDS[backend or default_backend()](file_path)
+
+
+# Function to extract every page of one PDF, timing the parse
+def extract_pages(file_path, backend=None):
+    backend = backend or default_backend()
+    started = time.perf_counter()
+    pages = list(iter_pages(file_path, backend))
+    return ExtractionResult(file_path, pages, time.perf_counter() - started, backend)
+
+
+# Function to extract many PDFs, in parallel across a process pool when the batch
+# is large enough. Results come back in input order and each file's parse time
+# is logged. Workers are spawned rather than forked, since this runs from a
+# thread of the multi-threaded Streamlit server.
+def extract_documents(file_paths, max_workers=None, backend=None):
+    file_paths = list(file_paths)
+    total_bytes = sum(os.path.getsize(file_path) for file_path in file_paths)
+    if len(file_paths) < 2 or total_bytes < MIN_BYTES_FOR_POOL:
+        results = [extract_pages(file_path, backend) for file_path in file_paths]
+    else:
+        max_workers = max_workers or min(len(file_paths), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results = list(executor.map(extract_pages, file_paths, [backend] * len(file_paths)))
+    for result in results:
+        logger.info(
+            "Extracted %d pages from %s in %.3fs (%s)",
+            len(result.pages), os.path.basename(result.path), result.seconds, result.backend,
+        )
+    return results
@@ -0,0 +1,115 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+from cache import TTLCache
+from flow_control import SingleFlight
+
+TEXT_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+
+# Raw Text Search result pages shared by every session, keyed by normalized
+# query and page number. Rating/size filters are applied afterwards so
+# changing them never refetches.
+PLACES_CACHE_TTL = 60 * 60
+places_cache = TTLCache(maxsize=1024, ttl=PLACES_CACHE_TTL, name="places")
+
+# Text Search returns at most 3 pages of 20 results. A next_page_token only
+# lives a few minutes and takes a moment to become valid after it is issued.
+MAX_PAGES = 3
+NEXT_PAGE_TOKEN_TTL = 120
+TOKEN_RETRIES = 4
+TOKEN_RETRY_DELAY = 0.5
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="places")
+
+# Sessions asking for the same page at the same moment share one request
+_flight = SingleFlight("places")
+
+
+class PlacesAPIError(Exception):
+    pass
+
+
+# Function to normalize a query so trivial variations share one cache entry
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def _request_page(query, api_key, page_token=None):
+    if page_token is None:
+        params = {"query": query, "key": api_key}
+    else:
+        params = {"pagetoken": page_token, "key": api_key}
+    for attempt in range(TOKEN_RETRIES + 1):
+        response = http_client.get("places", TEXT_SEARCH_URL, params=params)
+        if response.status_code != 200:
+            raise PlacesAPIError(f"API error {response.status_code}: {response.text}")
+        data = response.json()
+        if page_token and data.get("status") == "INVALID_REQUEST" and attempt < TOKEN_RETRIES:
+            time.sleep(TOKEN_RETRY_DELAY)
+            continue
+        return data
+
+
+# Function to fetch one page of raw Text Search results as (results, has_more),
+# served from the cache when possible
+def fetch_page(query, api_key, page=0, refresh=False):
+    key = normalize_query(query)
+    if not refresh:
+        cached = places_cache.get((key, page))
+        if cached is not None:
+            return cached
+    return _flight.do((key, page), lambda: _fetch_page(query, api_key, key, page))
+
+
+def _fetch_page(query, api_key, key, page):
+    token = None
+    if page:
+        token = places_cache.get((key, page - 1, "next"))
+        if token is None:
+            # The previous page is cached but its token expired; fetch it again for a new one
+            fetch_page(query, api_key, page - 1, refresh=True)
+            token = places_cache.get((key, page - 1, "next"))
+            if token is None:
+                return [], False
+
+    data = _request_page(query, api_key, token)
+    results = data.get("results", [])
+    next_token = data.get("next_page_token")
+    if next_token:
+        places_cache.set((key, page, "next"), next_token, ttl=NEXT_PAGE_TOKEN_TTL)
+    has_more = bool(next_token) and page + 1 < MAX_PAGES
+    # Quota and auth failures also come back as 200, so only cache real answers
+    if data.get("status", "OK") in ("OK", "ZERO_RESULTS"):
+        places_cache.set((key, page), (results, has_more))
+    return results, has_more
+
+
+# Function to filter by minimum rating and limit results
+def filter_places(results, min_rating, max_results):
+    filtered_results = [place for place in results if place.get("rating", 0) >= min_rating]
+    return filtered_results[:max_results]
+
+
+# Function to stream filtered results in batches, one per page. Further pages
+# are followed lazily, only while fewer than max_results places have passed the
+# filter, and the next page is prefetched in the background while the caller
+# renders the current batch.
+def iter_places(query, api_key, min_rating, max_results):
+    remaining = max_results
+    page, prefetched = 0, None
+    while remaining > 0:
+        if prefetched is None:
+            results, has_more = fetch_page(query, api_key, page)
+        else:
+            results, has_more = prefetched.result()
+        batch = filter_places(results, min_rating, remaining)
+        remaining -= len(batch)
+        if not has_more or remaining <= 0:
+            if batch:
+                yield batch
+            return
+        page += 1
+        prefetched = _executor.submit(fetch_page, query, api_key, page)
+        if batch:
+            yield batch
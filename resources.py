@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from tracing import span
+
+# Process-wide clients shared by every Streamlit session. st.cache_resource
+# creates each one once per distinct set of arguments and hands the same
+# instance to every session thread, so their HTTP connection pools are reused.
+# Heavy client libraries are imported inside the functions that build them, so
+# a page only pays for what it actually uses.
+
+# Runs the knowledge-base warm-up started at server boot
+_warmup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key):
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+
+@st.cache_resource(show_spinner=False)
+def get_chat_llm(model, temperature, api_key):
+    from langchain.chat_models import ChatOpenAI
+    return ChatOpenAI(temperature=temperature, model=model, openai_api_key=api_key, verbose=True)
+
+
+# Function to open the knowledge base and build the BM25 index over its chunks;
+# returns (collection, index). A prebuilt artifact (TRAVEL_INDEX_DIR) is opened
+# as is; otherwise the local store is synced with datafiles/.
+def _build_knowledge_base(api_key):
+    import vectorstore
+    from retrieval import BM25Index
+    with span("warmup.knowledge_base"):
+        if vectorstore.INDEX_DIR:
+            collection, _ = vectorstore.open_artifact(vectorstore.INDEX_DIR)
+        else:
+            collection = vectorstore.open_collection()
+            vectorstore.sync_collection(collection, get_openai_client(api_key))
+        return collection, BM25Index.from_collection(collection)
+
+
+# Function to start building the knowledge base in the background, once per
+# process. streamlit_app.py calls it at boot so the Travel Assistant's first
+# question does not wait for chromadb and the PDF sync; returns the Future.
+@st.cache_resource(show_spinner=False)
+def start_knowledge_base_warmup(api_key):
+    return _warmup_executor.submit(_build_knowledge_base, api_key)
+
+
+def knowledge_base_ready(api_key):
+    return start_knowledge_base_warmup(api_key).done()
+
+
+# Function to wait for the warm-up; a failed warm-up is dropped so the next
+# caller starts a fresh one instead of getting the cached error forever
+def _knowledge_base(api_key):
+    warmup = start_knowledge_base_warmup(api_key)
+    try:
+        return warmup.result()
+    except Exception:
+        start_knowledge_base_warmup.clear(api_key)
+        raise
+
+
+def get_vector_collection(api_key):
+    return _knowledge_base(api_key)[0]
+
+
+def get_lexical_index(api_key):
+    return _knowledge_base(api_key)[1]
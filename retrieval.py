@@ -0,0 +1,150 @@
+import logging
+import math
+import re
+from collections import Counter, namedtuple
+
+from embedding_cache import embed_query
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# A query is answered from the lexical index alone when one of its top chunks
+# covers at least this share of the query's idf mass and matches a term found in
+# at most RARE_TERM_FRACTION of the chunks (a country, a phone number, a policy word)
+STRONG_MATCH_RATIO = 0.6
+RARE_TERM_FRACTION = 0.25
+
+# Otherwise both rankings are fused; a chunk is used as context when either
+# signal clears its bar
+FUSION_CANDIDATES = 8
+RRF_K = 60
+MIN_LEXICAL_RATIO = 0.3
+MAX_VECTOR_DISTANCE = 0.7
+
+STOPWORDS = frozenset("""
+a about am an and any are as at be can could do does for from have how i if in is it me my
+of on or please should tell that the there this to was we what when where which who why will
+with would you your
+""".split())
+
+_TOKEN = re.compile(r"\w+")
+
+RetrievedChunk = namedtuple("RetrievedChunk", ["id", "text", "metadata", "lexical", "distance"])
+
+
+# Function to fold simple English plurals so "numbers" matches "number"
+def _stem(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [_stem(token) for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+# Okapi BM25 over an inverted index of the ingested chunks. Scores are also
+# reported as a ratio of the query's total idf, so "how well does this chunk
+# cover the question" can be compared across queries.
+class BM25Index:
+    def __init__(self, ids, documents, metadatas):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.postings = {}
+        lengths = []
+        for position, document in enumerate(self.documents):
+            counts = Counter(tokenize(document))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((position, tf))
+        average = sum(lengths) / len(lengths) if lengths else 0.0
+        self._norms = [BM25_K1 * (1 - BM25_B + BM25_B * length / average) if average else BM25_K1 for length in lengths]
+
+    # Function to build the index from everything stored in a Chroma collection
+    @classmethod
+    def from_collection(cls, collection):
+        stored = collection.get(include=["documents", "metadatas"])
+        return cls(stored["ids"], stored["documents"], stored["metadatas"])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.ids) - df + 0.5) / (df + 0.5))
+
+    # Function to rank chunks for a query; returns [(position, score, idf ratio, matched a rare term)]
+    def search(self, query, k=FUSION_CANDIDATES):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.ids:
+            return []
+        rare_df = max(1, int(RARE_TERM_FRACTION * len(self.ids)))
+        total_idf = 0.0
+        scores, rare = {}, set()
+        for term in terms:
+            idf = self.idf(term)
+            total_idf += idf
+            postings = self.postings.get(term, ())
+            for position, tf in postings:
+                scores[position] = scores.get(position, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + self._norms[position])
+                if len(postings) <= rare_df:
+                    rare.add(position)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(position, score, score / total_idf, position in rare) for position, score in ranked]
+
+    def chunk(self, position, lexical=None, distance=None):
+        return RetrievedChunk(self.ids[position], self.documents[position], self.metadatas[position], lexical, distance)
+
+
+# Function to retrieve context chunks for a question. A strong lexical match is
+# answered from the index without embedding the question; otherwise the BM25
+# and vector rankings are fused with reciprocal rank fusion. Returns
+# (chunks, path) where path is "lexical", "hybrid" or "none".
+def hybrid_search(collection, index, openai_client, query, embedding_model, k=4):
+    with span("retrieval.lexical") as current:
+        lexical = index.search(query, FUSION_CANDIDATES)
+        current.set(hits=len(lexical))
+    ratios = {position: ratio for position, _, ratio, _ in lexical}
+
+    strong = [ratio for _, _, ratio, rare in lexical[:k] if rare and ratio >= STRONG_MATCH_RATIO]
+    if strong:
+        chunks = [index.chunk(position, ratio) for position, _, ratio, _ in lexical[:k] if ratio >= MIN_LEXICAL_RATIO]
+        logger.info("retrieval %r: lexical fast path, idf ratio %.2f", query, max(strong))
+        return chunks, "lexical"
+
+    query_embedding = embed_query(openai_client, query, embedding_model)
+    with span("chroma.query", n_results=FUSION_CANDIDATES):
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            include=['distances'],
+            n_results=min(FUSION_CANDIDATES, len(index)) or 1
+        )
+    positions = {chunk_id: position for position, chunk_id in enumerate(index.ids)}
+    distances = {
+        positions[chunk_id]: distance
+        for chunk_id, distance in zip(results['ids'][0], results['distances'][0])
+        if chunk_id in positions
+    }
+
+    fused = {}
+    for rank, (position, _, _, _) in enumerate(lexical):
+        fused[position] = fused.get(position, 0.0) + 1 / (RRF_K + rank + 1)
+    for rank, position in enumerate(distances):
+        fused[position] = fused.get(position, 0.0) + 1 / (RRF_K + rank + 1)
+
+    chunks = []
+    for position in sorted(fused, key=fused.get, reverse=True):
+        ratio, distance = ratios.get(position), distances.get(position)
+        if (ratio or 0.0) >= MIN_LEXICAL_RATIO or (distance is not None and distance < MAX_VECTOR_DISTANCE):
+            chunks.append(index.chunk(position, ratio, distance))
+        if len(chunks) == k:
+            break
+    logger.info("retrieval %r: hybrid, %d of %d fused chunks kept", query, len(chunks), len(fused))
+    return chunks, "hybrid" if chunks else "none"
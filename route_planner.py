@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Legs shorter than this are walked, longer ones driven at a city average speed
+WALKING_MAX_KM = 1.5
+WALKING_KMH = 4.5
+DRIVING_KMH = 25.0
+# Straight-line distance understates street distance by roughly this factor
+DETOUR_FACTOR = 1.3
+
+DAY_START = "09:00"
+DAY_END = "20:00"
+VISIT_MINUTES = 90
+MIN_VISIT_MINUTES = 30
+LUNCH_AFTER = "12:30"
+LUNCH_MINUTES = 60
+
+
+# Function to compute the pairwise great-circle distance matrix (km) of (lat, lng) pairs
+def haversine_matrix(coords):
+    radians = np.radians(np.asarray(coords, dtype=float))
+    lat, lng = radians[:, 0:1], radians[:, 1:2]
+    dlat = lat.T - lat
+    dlng = lng.T - lng
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def path_length(order, dist):
+    return float(sum(dist[a, b] for a, b in zip(order, order[1:])))
+
+
+def nearest_neighbour(dist, start):
+    unvisited = set(range(len(dist))) - {start}
+    order = [start]
+    while unvisited:
+        last = order[-1]
+        nearest = min(unvisited, key=lambda j: dist[last, j])
+        order.append(nearest)
+        unvisited.remove(nearest)
+    return order
+
+
+# Function to improve an open path by reversing segments while that shortens it
+def two_opt(order, dist):
+    order = list(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(order) - 1):
+            for j in range(i + 1, len(order)):
+                a, b = order[i - 1], order[i]
+                c = order[j]
+                d = order[j + 1] if j + 1 < len(order) else None
+                before = dist[a, b] + (dist[c, d] if d is not None else 0.0)
+                after = dist[a, c] + (dist[b, d] if d is not None else 0.0)
+                if after < before - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+    return order
+
+
+# Function to find a short visiting order: nearest neighbour from every start, each refined with 2-opt
+def plan_route(coords):
+    if len(coords) < 3:
+        return list(range(len(coords))), haversine_matrix(coords) if coords else np.zeros((0, 0))
+    dist = haversine_matrix(coords)
+    best = min(
+        (two_opt(nearest_neighbour(dist, start), dist) for start in range(len(coords))),
+        key=lambda order: path_length(order, dist),
+    )
+    return best, dist
+
+
+def leg(distance_km):
+    distance_km *= DETOUR_FACTOR
+    if distance_km <= WALKING_MAX_KM:
+        return "walk", distance_km, distance_km / WALKING_KMH * 60
+    return "drive", distance_km, distance_km / DRIVING_KMH * 60
+
+
+# Function to turn bucket places ({"name", "lat", "lng"}) into a timed schedule.
+# Time at each stop shrinks (down to MIN_VISIT_MINUTES) so long buckets still fit the day.
+def build_schedule(places, day_start=DAY_START, day_end=DAY_END):
+    order, dist = plan_route([(place["lat"], place["lng"]) for place in places])
+    legs = [None] + [leg(dist[a, b]) for a, b in zip(order, order[1:])]
+    clock = datetime.strptime(day_start, "%H:%M")
+    lunch_after = datetime.strptime(LUNCH_AFTER, "%H:%M")
+
+    travel_minutes = sum(round(l[2]) for l in legs if l)
+    available = (datetime.strptime(day_end, "%H:%M") - clock).total_seconds() / 60 - travel_minutes - LUNCH_MINUTES
+    visit_minutes = int(min(VISIT_MINUTES, max(MIN_VISIT_MINUTES, available / max(len(order), 1))) // 5 * 5)
+
+    had_lunch = False
+    schedule = []
+    for position, index in enumerate(order):
+        stop = {"name": places[index]["name"], "travel": None}
+        if legs[position]:
+            mode, km, minutes = legs[position]
+            clock += timedelta(minutes=round(minutes))
+            stop["travel"] = {"mode": mode, "km": round(float(km), 1), "minutes": max(1, round(minutes))}
+        stop["arrive"] = clock.strftime("%H:%M")
+        clock += timedelta(minutes=visit_minutes)
+        stop["depart"] = clock.strftime("%H:%M")
+        stop["lunch"] = False
+        if not had_lunch and clock >= lunch_after and position < len(order) - 1:
+            stop["lunch"] = True
+            clock += timedelta(minutes=LUNCH_MINUTES)
+            had_lunch = True
+        schedule.append(stop)
+    return schedule
+
+
+def format_schedule(schedule):
+    lines = []
+    for number, stop in enumerate(schedule, start=1):
+        if stop["travel"]:
+            travel = stop["travel"]
+            lines.append(f"   ({travel['mode']} {travel['km']} km, about {travel['minutes']} min)")
+        lines.append(f"{number}. {stop['arrive']}-{stop['depart']} {stop['name']}")
+        if stop["lunch"]:
+            lines.append(f"   Lunch break ({LUNCH_MINUTES} min)")
+    return "\n".join(lines)
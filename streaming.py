@@ -0,0 +1,63 @@
+import logging
+import time
+from collections import namedtuple
+
+from tracing import record_usage, span
+
+logger = logging.getLogger(__name__)
+
+StreamResult = namedtuple("StreamResult", ["text", "first_token_seconds", "total_seconds"])
+
+
+# Function to pull the text deltas out of an OpenAI chat completion stream.
+# Closing the generator closes the HTTP response, which stops generation.
+# Token usage arrives on the final chunk when the stream was opened with
+# stream_options={"include_usage": True}.
+def openai_deltas(stream):
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                record_usage(chunk.model, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+
+# Function to pull the text out of a LangChain .stream() iterator
+def langchain_deltas(chunks):
+    try:
+        for chunk in chunks:
+            yield chunk.content
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+# Function to render text deltas into a placeholder as they arrive. When the
+# user triggers a rerun, Streamlit raises inside placeholder.markdown and the
+# finally block closes the upstream stream, so generation stops with it.
+def render_stream(deltas, placeholder, label="stream", started=None):
+    started = started or time.perf_counter()
+    full_response = ""
+    first_token_seconds = None
+    with span(f"stream.{label}") as current:
+        try:
+            for delta in deltas:
+                if not delta:
+                    continue
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - started
+                    current.set(first_token_seconds=first_token_seconds)
+                full_response += delta
+                placeholder.markdown(full_response + "▌")
+        finally:
+            close = getattr(deltas, "close", None)
+            if close:
+                close()
+        current.set(characters=len(full_response))
+    placeholder.markdown(full_response)
+    total_seconds = time.perf_counter() - started
+    logger.info("%s: first token %.3fs, total %.3fs", label, first_token_seconds or total_seconds, total_seconds)
+    return StreamResult(full_response, first_token_seconds, total_seconds)
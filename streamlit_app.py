@@ -1,11 +1,24 @@
 
 import streamlit as st
-from streamlit_option_menu import option_menu
+
+from diagnostics import debug_panel_enabled, render_debug_panel
+from resources import start_knowledge_base_warmup
+from tracing import span, start_metrics_server
+
 # Set page configuration (must be the first Streamlit command)
 st.set_page_config(page_title="Interactive Travel Guide Chatbot", page_icon="🌎", layout="wide")
+# Aggregated span, token and cache stats at /metrics and /metrics.json
+start_metrics_server()
+# Sync the Travel Assistant's vector store in the background from the first
+# request onwards, so no page waits on another page's dependencies
+if "key1" in st.secrets:
+    start_knowledge_base_warmup(st.secrets["key1"])
 page1 = st.Page("page1.py", title="Explore")
 page2 = st.Page("page2.py", title="Itinerary")
 page3 = st.Page("page3.py", title="Travel Translator")
 page4 = st.Page("page4.py", title = "Travel Assistant")
 pg = st.navigation([page1, page2, page4, page3])
-pg.run()
+with span(f"page.{pg.title}"):
+    pg.run()
+if debug_panel_enabled():
+    render_debug_panel()
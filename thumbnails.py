@@ -0,0 +1,149 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+from cache import TTLCache
+from flow_control import SingleFlight
+
+PHOTO_URL = "https://maps.googleapis.com/maps/api/place/photo"
+THUMBNAIL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "thumbnails")
+MAX_FETCH_WORKERS = 8
+# Photos that failed to download or decode are not retried for this long
+FAILURE_TTL = 5 * 60
+# Size bound of the on-disk cache; the least recently used thumbnails go first
+MAX_DISK_BYTES = 100 * 1024 * 1024
+EVICTION_INTERVAL = 60
+
+# Encoded thumbnails kept in memory in front of the disk cache
+thumbnail_cache = TTLCache(maxsize=512, name="thumbnails")
+failed_thumbnails = TTLCache(maxsize=1024, ttl=FAILURE_TTL, name="thumbnail_failures")
+_executor = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS, thread_name_prefix="thumbnails")
+
+# Sessions showing the same photo at the same moment share one download
+_flight = SingleFlight("thumbnails")
+
+_last_eviction = 0.0
+_eviction_lock = threading.Lock()
+
+
+# Function to build the content address of a resized thumbnail
+def thumbnail_key(photo_ref, size):
+    return hashlib.sha256(f"{photo_ref}:{size[0]}x{size[1]}".encode("utf-8")).hexdigest()
+
+
+def _thumbnail_path(key):
+    return os.path.join(THUMBNAIL_DIR, key[:2], f"{key}.jpg")
+
+
+def _read_from_disk(key):
+    path = _thumbnail_path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # Recently shown thumbnails are evicted last
+        return data
+    except OSError:
+        return None
+
+
+# Write through a temp file so concurrent sessions never see a partial image
+def _write_to_disk(key, data):
+    path = _thumbnail_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _maybe_evict_disk()
+
+
+def _maybe_evict_disk():
+    global _last_eviction
+    now = time.monotonic()
+    with _eviction_lock:
+        if now - _last_eviction < EVICTION_INTERVAL:
+            return
+        _last_eviction = now
+    evict_disk()
+
+
+# Function to delete the least recently used thumbnails until the disk cache fits MAX_DISK_BYTES
+def evict_disk(max_bytes=MAX_DISK_BYTES):
+    files = []
+    for root, _, names in os.walk(THUMBNAIL_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+# Helper function to download a photo and resize it to uniform dimensions
+def fetch_and_resize_image(photo_ref, api_key, size=(200, 200)):
+    params = {"maxwidth": 400, "photoreference": photo_ref, "key": api_key}
+    response = http_client.get("photo", PHOTO_URL, params=params)
+    response.raise_for_status()
+    from PIL import Image
+    img = Image.open(io.BytesIO(response.content)).convert("RGB")
+    img = img.resize(size)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+# Function to load a thumbnail missing from memory: disk first, then the network
+def _load_thumbnail(photo_ref, api_key, size):
+    key = thumbnail_key(photo_ref, size)
+    return _flight.do(key, lambda: _load_uncached(photo_ref, api_key, size, key))
+
+
+def _load_uncached(photo_ref, api_key, size, key):
+    data = _read_from_disk(key)
+    if data is None:
+        try:
+            data = fetch_and_resize_image(photo_ref, api_key, size)
+        except Exception:
+            # Remember the failure so reruns show the placeholder without refetching
+            failed_thumbnails.set(key, True)
+            return None
+        _write_to_disk(key, data)
+    thumbnail_cache.set(key, data)
+    return data
+
+
+# Function to fetch many thumbnails in parallel, returning {photo_ref: jpeg bytes or None}
+def get_thumbnails(photo_refs, api_key, size=(200, 200)):
+    thumbnails = {}
+    pending = {}
+    for photo_ref in dict.fromkeys(photo_refs):
+        key = thumbnail_key(photo_ref, size)
+        data = thumbnail_cache.get(key)
+        if data is not None:
+            thumbnails[photo_ref] = data
+        elif failed_thumbnails.get(key):
+            thumbnails[photo_ref] = None
+        else:
+            pending[photo_ref] = _executor.submit(_load_thumbnail, photo_ref, api_key, size)
+    for photo_ref, future in pending.items():
+        thumbnails[photo_ref] = future.result()
+    return thumbnails
@@ -0,0 +1,47 @@
+import json
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tracing import span
+
+MAX_TOOL_WORKERS = 8
+_executor = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="tools")
+
+ToolResult = namedtuple("ToolResult", ["index", "name", "arguments", "value", "error"])
+
+
+# Function to turn OpenAI tool calls into (name, arguments) pairs
+def parse_tool_calls(tool_calls):
+    calls = []
+    for tool_call in tool_calls:
+        try:
+            arguments = json.loads(tool_call.function.arguments or "{}")
+        except ValueError:
+            arguments = {}
+        calls.append((tool_call.function.name, arguments))
+    return calls
+
+
+def _run_handler(name, handler, arguments):
+    with span(f"tool.{name}"):
+        return handler(arguments)
+
+
+# Function to run any number of tool calls concurrently. Handlers run on worker
+# threads and must not touch Streamlit; results are yielded as each one finishes
+# so the script thread can render them in arrival order.
+def run_tool_calls(calls, handlers):
+    futures = {}
+    for index, (name, arguments) in enumerate(calls):
+        handler = handlers.get(name)
+        if handler is None:
+            yield ToolResult(index, name, arguments, None, KeyError(f"Unknown tool: {name}"))
+            continue
+        futures[_executor.submit(_run_handler, name, handler, arguments)] = (index, name, arguments)
+
+    for future in as_completed(futures):
+        index, name, arguments = futures[future]
+        try:
+            yield ToolResult(index, name, arguments, future.result(), None)
+        except Exception as e:
+            yield ToolResult(index, name, arguments, None, e)
@@ -0,0 +1,218 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import named_caches
+from flow_control import flow_stats
+
+logger = logging.getLogger(__name__)
+
+# Durations kept per span name for the percentiles, and finished spans kept for the debug panel
+SPAN_WINDOW = 1000
+RECENT_SPANS = 200
+
+# Metrics endpoint serving /metrics (Prometheus text) and /metrics.json; set METRICS_PORT=0 to turn it off
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9108"))
+
+
+# One timed unit of work. Attributes such as payload sizes can be added with
+# set() while the span is open; status is "ok" or the exception class name.
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.status = "ok"
+        self.started = time.time()
+        self.seconds = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+# Process-wide aggregates of every span and of OpenAI token usage, shared by all sessions
+class Tracer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._tokens = {}
+        self._recent = deque(maxlen=RECENT_SPANS)
+
+    def record(self, span):
+        with self._lock:
+            stats = self._stats.get(span.name)
+            if stats is None:
+                stats = self._stats[span.name] = {
+                    "count": 0, "errors": 0, "seconds": 0.0,
+                    "bytes_sent": 0, "bytes_received": 0,
+                    "window": deque(maxlen=SPAN_WINDOW),
+                }
+            stats["count"] += 1
+            stats["seconds"] += span.seconds
+            stats["window"].append(span.seconds)
+            stats["bytes_sent"] += span.attrs.get("bytes_sent", 0)
+            stats["bytes_received"] += span.attrs.get("bytes_received", 0)
+            if span.status != "ok":
+                stats["errors"] += 1
+            self._recent.append(span)
+
+    def record_usage(self, model, prompt_tokens, completion_tokens):
+        with self._lock:
+            usage = self._tokens.setdefault(model, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            usage["requests"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+
+    def snapshot(self):
+        with self._lock:
+            spans = {}
+            for name, stats in sorted(self._stats.items()):
+                window = sorted(stats["window"])
+                spans[name] = {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "seconds_total": stats["seconds"],
+                    "p50": percentile(window, 50),
+                    "p95": percentile(window, 95),
+                    "max": window[-1] if window else None,
+                    "bytes_sent": stats["bytes_sent"],
+                    "bytes_received": stats["bytes_received"],
+                }
+            tokens = {model: dict(usage) for model, usage in sorted(self._tokens.items())}
+            recent = [
+                {"name": span.name, "status": span.status, "seconds": span.seconds, "started": span.started, **span.attrs}
+                for span in reversed(self._recent)
+            ]
+        caches = {name: cache.stats() for name, cache in sorted(named_caches().items())}
+        return {"spans": spans, "tokens": tokens, "caches": caches, **flow_stats(), "recent": recent}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._tokens.clear()
+            self._recent.clear()
+
+
+tracer = Tracer()
+
+
+# Function to take the p-th percentile of already sorted values (nearest rank)
+def percentile(values, p):
+    if not values:
+        return None
+    rank = min(len(values), max(1, math.ceil(p / 100 * len(values))))
+    return values[rank - 1]
+
+
+# Function to time a block as a named span:
+#     with span("http.places", endpoint="places") as current:
+#         ...
+#         current.set(bytes_received=len(body))
+@contextmanager
+def span(name, **attrs):
+    current = Span(name, attrs)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        # Streamlit's rerun/stop signals pass through here too and are recorded as such
+        current.status = type(e).__name__
+        raise
+    finally:
+        current.seconds = time.perf_counter() - started
+        tracer.record(current)
+
+
+# Function to record the token usage returned with an OpenAI response or final stream chunk
+def record_usage(model, usage):
+    if usage is None:
+        return
+    tracer.record_usage(model, getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Function to render a snapshot in the Prometheus text exposition format
+def prometheus_text(snapshot=None):
+    snapshot = snapshot or tracer.snapshot()
+    lines = ["# TYPE travel_span_seconds summary"]
+    for name, stats in snapshot["spans"].items():
+        for quantile, key in (("0.5", "p50"), ("0.95", "p95")):
+            lines.append(f'travel_span_seconds{{span="{_label(name)}",quantile="{quantile}"}} {stats[key]}')
+        lines.append(f'travel_span_seconds_sum{{span="{_label(name)}"}} {stats["seconds_total"]}')
+        lines.append(f'travel_span_seconds_count{{span="{_label(name)}"}} {stats["count"]}')
+    for metric, key in (("errors", "errors"), ("bytes_sent", "bytes_sent"), ("bytes_received", "bytes_received")):
+        lines.append(f"# TYPE travel_span_{metric}_total counter")
+        for name, stats in snapshot["spans"].items():
+            lines.append(f'travel_span_{metric}_total{{span="{_label(name)}"}} {stats[key]}')
+    lines.append("# TYPE travel_openai_tokens_total counter")
+    for model, usage in snapshot["tokens"].items():
+        for kind in ("prompt", "completion"):
+            lines.append(f'travel_openai_tokens_total{{model="{_label(model)}",kind="{kind}"}} {usage[kind + "_tokens"]}')
+    lines.append("# TYPE travel_openai_requests_total counter")
+    for model, usage in snapshot["tokens"].items():
+        lines.append(f'travel_openai_requests_total{{model="{_label(model)}"}} {usage["requests"]}')
+    for metric, key, kind in (("hits", "hits", "counter"), ("misses", "misses", "counter"), ("entries", "size", "gauge")):
+        suffix = "_total" if kind == "counter" else ""
+        lines.append(f"# TYPE travel_cache_{metric}{suffix} {kind}")
+        for name, stats in snapshot["caches"].items():
+            lines.append(f'travel_cache_{metric}{suffix}{{cache="{_label(name)}"}} {stats[key]}')
+    lines.append("# TYPE travel_coalesced_calls_total counter")
+    for name, stats in snapshot["flights"].items():
+        lines.append(f'travel_coalesced_calls_total{{flight="{_label(name)}"}} {stats["shared"]}')
+    for metric, key, kind in (("in_flight", "in_flight", "gauge"), ("throttled_total", "throttled", "counter"), ("wait_seconds_total", "wait_seconds", "counter")):
+        lines.append(f"# TYPE travel_upstream_{metric} {kind}")
+        for name, stats in snapshot["upstreams"].items():
+            lines.append(f'travel_upstream_{metric}{{upstream="{_label(name)}"}} {stats[key]}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body, content_type = prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+        elif path == "/metrics.json":
+            body, content_type = json.dumps(tracer.snapshot(), default=str).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_started = False
+_server_lock = threading.Lock()
+
+
+# Function to start the metrics endpoint once per process, on a daemon thread
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    global _server, _server_started
+    with _server_lock:
+        if _server_started or not port:
+            return _server
+        _server_started = True
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning("metrics endpoint not started on %s:%s: %s", host, port, e)
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        logger.info("metrics on http://%s:%s/metrics and /metrics.json", host, port)
+        return _server
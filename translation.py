@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from cache import TTLCache
+from flow_control import limit
+from tracing import record_usage, span
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DB_PATH = os.path.join(BASE_DIR, ".cache", "translations.sqlite3")
+PHRASEBOOK_DIR = os.path.join(BASE_DIR, "phrasebooks")
+
+TRANSLATION_MODEL = "gpt-4"
+# Translations are cached, so they are generated deterministically
+TRANSLATION_TEMPERATURE = 0
+# Bump when the translation prompt or temperature changes so stored translations are not reused
+TRANSLATION_PROMPT_VERSION = 1
+
+# Dictionary of countries and their primary languages
+COUNTRY_LANGUAGES = {
+    "Spain": "Spanish",
+    "France": "French",
+    "Germany": "German",
+    "Italy": "Italian",
+    "Japan": "Japanese",
+    "China": "Chinese",
+    "Brazil": "Portuguese",
+    "North India": "Hindi",
+    "Telangana / Andhra Pradesh": "Telugu",
+}
+
+# Stock phrases precomputed into each language's phrasebook
+STOCK_PHRASES = [
+    "Hello",
+    "Thank you",
+    "Please",
+    "Excuse me",
+    "Sorry",
+    "Yes",
+    "No",
+    "Goodbye",
+    "Where is the bathroom?",
+    "How much is this?",
+    "Do you speak English?",
+    "I don't understand",
+    "Can you help me?",
+    "Where is the train station?",
+    "Where is the hotel?",
+    "I need a doctor",
+    "Call the police",
+    "The bill, please",
+    "A table for two, please",
+    "Do you accept credit cards?",
+    "Where can I get a taxi?",
+    "How do I get to the airport?",
+    "Is it far from here?",
+    "I am allergic to nuts",
+    "Water, please",
+]
+
+# Translations shared by every session: memory in front of a local SQLite file
+translation_cache = TTLCache(maxsize=4096, name="translations")
+
+
+# Function to normalize text so "Where is the bathroom?" and "where is the bathroom" match
+def normalize_text(text):
+    return " ".join(text.lower().split()).rstrip(".!?¿¡ ")
+
+
+# Function to key a translation by (model, prompt version, language, normalized text)
+def translation_key(text, target_language, model=TRANSLATION_MODEL, prompt_version=TRANSLATION_PROMPT_VERSION):
+    canonical = f"{model}\0{prompt_version}\0{target_language.lower()}\0{normalize_text(text)}"
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class TranslationStore:
+    def __init__(self, path=CACHE_DB_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, language TEXT, source TEXT, translation TEXT)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, language, source, translation):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, language, source, translation) VALUES (?, ?, ?, ?)",
+                (key, language, source, translation),
+            )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TranslationStore()
+        return _store
+
+
+def _phrasebook_path(language):
+    return os.path.join(PHRASEBOOK_DIR, f"{language.lower()}.json")
+
+
+# Function to load every prebuilt phrasebook as {language: {normalized phrase: translation}}
+def load_phrasebooks():
+    phrasebooks = {}
+    for language in COUNTRY_LANGUAGES.values():
+        try:
+            with open(_phrasebook_path(language), encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            continue
+        phrasebooks[language] = {normalize_text(phrase): translation for phrase, translation in entries.items()}
+    return phrasebooks
+
+
+phrasebooks = load_phrasebooks()
+
+
+# Function to look a translation up in the phrasebook, then memory, then SQLite
+def lookup_translation(text, target_language):
+    phrase = phrasebooks.get(target_language, {}).get(normalize_text(text))
+    if phrase is not None:
+        return phrase
+    key = translation_key(text, target_language)
+    translation = translation_cache.get(key)
+    if translation is None:
+        translation = get_store().get(key)
+        if translation is not None:
+            translation_cache.set(key, translation)
+    return translation
+
+
+def store_translation(text, target_language, translation):
+    key = translation_key(text, target_language)
+    translation_cache.set(key, translation)
+    get_store().put(key, target_language, text, translation)
+
+
+def translation_messages(text, target_language):
+    return [
+        {"role": "system", "content": f"You are a translator. Translate the following text to {target_language}. Maintain the tone and meaning of the original text. Only respond with the translation, no additional text. Also, do not talk too fast"},
+        {"role": "user", "content": text}
+    ]
+
+
+# Function to ask the model for a translation
+def request_translation(openai_client, text, target_language):
+    with span("openai.chat", model=TRANSLATION_MODEL, purpose="translation"), limit("openai_chat"):
+        response = openai_client.chat.completions.create(
+            model=TRANSLATION_MODEL,
+            messages=translation_messages(text, target_language),
+            temperature=TRANSLATION_TEMPERATURE
+        )
+    record_usage(TRANSLATION_MODEL, response.usage)
+    return response.choices[0].message.content
+
+
+# Function to translate text, calling the model only on a cache miss
+def translate(openai_client, text, target_language):
+    translation = lookup_translation(text, target_language)
+    if translation is None:
+        translation = request_translation(openai_client, text, target_language)
+        store_translation(text, target_language, translation)
+    return translation
+
+
+# Function to precompute the stock-phrase phrasebook for one language
+def build_phrasebook(openai_client, language):
+    entries = {phrase: request_translation(openai_client, phrase, language) for phrase in STOCK_PHRASES}
+    os.makedirs(PHRASEBOOK_DIR, exist_ok=True)
+    with open(_phrasebook_path(language), "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    return entries
+
+
+# Usage: OPENAI_API_KEY=... python translation.py [language ...]
+# Builds phrasebooks/<language>.json for the given languages, or for all of them.
+if __name__ == "__main__":
+    from openai import OpenAI
+    client = OpenAI()
+    for language in sys.argv[1:] or sorted(set(COUNTRY_LANGUAGES.values())):
+        build_phrasebook(client, language)
+        print(f"Built phrasebook for {language}")
@@ -0,0 +1,286 @@
+import atexit
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+__import__('pysqlite3')
+import sys
+sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+
+import chromadb
+
+from embedding_cache import embed_texts, EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL
+from pdf_extract import extract_documents
+from tracing import span
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATAFILES_DIR = os.path.join(BASE_DIR, "datafiles")
+CHROMA_PATH = os.path.join(BASE_DIR, "chroma")
+COLLECTION_NAME = "travelfaq_collection"
+
+# Chunking settings; changing the chunking re-ingests every file
+CHUNK_WORDS = 300
+CHUNK_OVERLAP_WORDS = 50
+CHUNKING = f"words:{CHUNK_WORDS}/{CHUNK_OVERLAP_WORDS}"
+
+# Per-file content hash and mtime of everything currently embedded in the collection
+MANIFEST_NAME = "ingest_manifest.json"
+
+# Versioned index artifacts written by build_index.py: <index dir>/<version>/
+# holds a finished Chroma store plus ARTIFACT_NAME, and <index dir>/CURRENT names
+# the version to serve. When TRAVEL_INDEX_DIR points at an index dir (or at one
+# artifact), the app opens it read-only instead of ingesting datafiles/ itself.
+INDEX_DIR = os.environ.get("TRAVEL_INDEX_DIR")
+ARTIFACT_NAME = "artifact.json"
+CURRENT_NAME = "CURRENT"
+
+# Private copies of opened artifacts in this process, by version
+_local_copies = {}
+
+
+# Function to open (or create) the persistent collection
+def open_collection(path=None):
+    client = chromadb.PersistentClient(path=path or CHROMA_PATH)
+    return client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        metadata={"hnsw:space": "cosine", "hnsw:M": 32}
+    )
+
+
+def _manifest_path(path):
+    return os.path.join(path, MANIFEST_NAME)
+
+
+def load_manifest(path=None):
+    try:
+        with open(_manifest_path(path or CHROMA_PATH)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=None):
+    path = path or CHROMA_PATH
+    os.makedirs(path, exist_ok=True)
+    tmp_path = _manifest_path(path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, _manifest_path(path))
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to split pages into overlapping word windows. Chunks never span a
+# page, so every chunk can cite its source file and page number.
+def chunk_pages(pages, filename, chunk_words=CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    chunks = []
+    step = chunk_words - overlap_words
+    for page_number, page_text in enumerate(pages, start=1):
+        words = page_text.split()
+        for chunk_index, start in enumerate(range(0, max(len(words) - overlap_words, 1), step)):
+            text = " ".join(words[start:start + chunk_words])
+            if not text:
+                continue
+            chunks.append({
+                "id": f"{filename}:p{page_number}:c{chunk_index}",
+                "text": text,
+                "metadata": {"source": filename, "page": page_number, "chunk": chunk_index},
+            })
+    return chunks
+
+
+# Function to embed chunks with many inputs per request and add them to the collection
+def add_to_collection(collection, openai_client, chunks):
+    for start in range(0, len(chunks), EMBEDDING_BATCH_SIZE):
+        batch = chunks[start:start + EMBEDDING_BATCH_SIZE]
+        embeddings = embed_texts(openai_client, [chunk["text"] for chunk in batch], EMBEDDING_MODEL)
+        collection.upsert(
+            documents=[chunk["text"] for chunk in batch],
+            ids=[chunk["id"] for chunk in batch],
+            embeddings=embeddings,
+            metadatas=[chunk["metadata"] for chunk in batch]
+        )
+    return collection
+
+
+# Function to delete a file's chunks, and the single whole-document row (id = filename,
+# no metadata) that stores written before chunking hold for it
+def remove_from_collection(collection, filename):
+    collection.delete(where={"source": filename})
+    collection.delete(ids=[filename])
+
+
+# Function to bring the collection in line with datafiles/: only new or changed
+# PDFs are parsed and embedded, deleted ones have their vectors removed, and a
+# warm store whose files are untouched costs nothing beyond a stat per file.
+# Returns (added_or_updated, removed) filenames.
+def sync_collection(collection, openai_client, datafiles_path=None, path=None):
+    datafiles_path = datafiles_path or DATAFILES_DIR
+    path = path or CHROMA_PATH
+    manifest = load_manifest(path)
+    if manifest and collection.count() == 0:
+        manifest = {}  # The store was wiped underneath the manifest
+    if not manifest and collection.count():
+        # Rows nothing in the manifest accounts for, e.g. the whole-document
+        # vectors of a store created before chunking, are dropped and re-ingested
+        collection.delete(ids=collection.get(include=[])["ids"])
+
+    pdf_files = sorted(f for f in os.listdir(datafiles_path) if f.endswith('.pdf'))
+    changed, removed = [], []
+    dirty = not os.path.exists(_manifest_path(path))
+
+    for pdf_file in pdf_files:
+        file_path = os.path.join(datafiles_path, pdf_file)
+        stat = os.stat(file_path)
+        entry = manifest.get(pdf_file)
+        if entry and entry.get("chunking") != CHUNKING:
+            entry = None
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            continue
+        digest = file_sha256(file_path)
+        if entry is None or entry["sha256"] != digest:
+            changed.append(pdf_file)
+        manifest[pdf_file] = {"sha256": digest, "mtime": stat.st_mtime, "size": stat.st_size, "chunking": CHUNKING}
+        dirty = True
+
+    # Changed files are parsed in parallel, and their chunks share the same
+    # batched embedding requests
+    chunks = []
+    with span("vectorstore.extract", files=len(changed)):
+        for result in extract_documents(os.path.join(datafiles_path, f) for f in changed):
+            pdf_file = os.path.basename(result.path)
+            remove_from_collection(collection, pdf_file)
+            chunks.extend(chunk_pages(result.pages, pdf_file))
+    with span("vectorstore.embed", chunks=len(chunks)):
+        add_to_collection(collection, openai_client, chunks)
+
+    for pdf_file in sorted(set(manifest) - set(pdf_files)):
+        remove_from_collection(collection, pdf_file)
+        del manifest[pdf_file]
+        removed.append(pdf_file)
+        dirty = True
+
+    if dirty:
+        save_manifest(manifest, path)
+    return changed, removed
+
+
+def datafile_hashes(datafiles_path=None):
+    datafiles_path = datafiles_path or DATAFILES_DIR
+    return {
+        f: file_sha256(os.path.join(datafiles_path, f))
+        for f in sorted(os.listdir(datafiles_path)) if f.endswith('.pdf')
+    }
+
+
+# Function to name an artifact after everything that determines its contents,
+# so rebuilding unchanged inputs yields the same version
+def artifact_version(files, embedding_model=EMBEDDING_MODEL, chunking=CHUNKING):
+    key = json.dumps([COLLECTION_NAME, embedding_model, chunking, files], sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def load_artifact(artifact_path):
+    with open(os.path.join(artifact_path, ARTIFACT_NAME)) as f:
+        return json.load(f)
+
+
+def _write_current(index_dir, version):
+    tmp_path = os.path.join(index_dir, CURRENT_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(index_dir, CURRENT_NAME))
+
+
+# Function to ingest datafiles/ into a new versioned artifact under index_dir and
+# point CURRENT at it. The store is built in a scratch directory and renamed into
+# place when complete, so readers never see a half-built version; an existing
+# artifact with the same version is reused. Returns the artifact's manifest.
+def build_artifact(openai_client, index_dir, datafiles_path=None):
+    files = datafile_hashes(datafiles_path)
+    version = artifact_version(files)
+    artifact_path = os.path.join(index_dir, version)
+    os.makedirs(index_dir, exist_ok=True)
+
+    if not os.path.exists(os.path.join(artifact_path, ARTIFACT_NAME)):
+        build_path = tempfile.mkdtemp(prefix=f".{version}-", dir=index_dir)
+        try:
+            collection = open_collection(build_path)
+            sync_collection(collection, openai_client, datafiles_path, build_path)
+            artifact = {
+                "version": version,
+                "collection": COLLECTION_NAME,
+                "embedding_model": EMBEDDING_MODEL,
+                "chunking": CHUNKING,
+                "files": files,
+                "chunks": collection.count(),
+                "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            with open(os.path.join(build_path, ARTIFACT_NAME), "w") as f:
+                json.dump(artifact, f, indent=2, sort_keys=True)
+            try:
+                os.rename(build_path, artifact_path)
+            except OSError:
+                if not os.path.exists(os.path.join(artifact_path, ARTIFACT_NAME)):
+                    raise
+                shutil.rmtree(build_path, ignore_errors=True)  # A concurrent build finished first
+        except BaseException:
+            shutil.rmtree(build_path, ignore_errors=True)
+            raise
+
+    _write_current(index_dir, version)
+    return load_artifact(artifact_path)
+
+
+# Function to find the artifact to serve: index_dir is either one artifact or a
+# build_index.py output directory whose CURRENT file names the version
+def resolve_artifact(index_dir):
+    if os.path.exists(os.path.join(index_dir, ARTIFACT_NAME)):
+        return index_dir
+    with open(os.path.join(index_dir, CURRENT_NAME)) as f:
+        return os.path.join(index_dir, f.read().strip())
+
+
+def _remove_local_copies():
+    for path in _local_copies.values():
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+# Function to copy an artifact to a temp directory owned by this process, once
+# per version; the copies are removed when the process exits
+def _local_copy(artifact_path, version):
+    if version not in _local_copies:
+        if not _local_copies:
+            atexit.register(_remove_local_copies)
+        local_dir = tempfile.mkdtemp(prefix="travel-index-")
+        try:
+            shutil.copytree(artifact_path, os.path.join(local_dir, version))
+        except BaseException:
+            shutil.rmtree(local_dir, ignore_errors=True)
+            raise
+        _local_copies[version] = os.path.join(local_dir, version)
+    return _local_copies[version]
+
+
+# Function to open a built artifact for querying. Chroma writes to whatever
+# directory it opens, so the shared artifact is only ever read: each process
+# opens its own private copy, whether or not the mount is read-only, and any
+# number of replicas can serve the same artifact. Returns (collection, artifact manifest).
+def open_artifact(index_dir):
+    artifact_path = resolve_artifact(index_dir)
+    artifact = load_artifact(artifact_path)
+    if artifact["embedding_model"] != EMBEDDING_MODEL:
+        raise ValueError(
+            f"index {artifact['version']} was embedded with {artifact['embedding_model']}, "
+            f"but queries use {EMBEDDING_MODEL}; rebuild it with build_index.py"
+        )
+    client = chromadb.PersistentClient(path=_local_copy(artifact_path, artifact["version"]))
+    return client.get_collection(name=artifact["collection"]), artifact
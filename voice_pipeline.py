@@ -0,0 +1,138 @@
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import closing
+
+from audio_store import TTS_VOICE, audio_key, get_store, synthesize
+from flow_control import limit
+from tracing import record_usage, span
+from translation import (
+    TRANSLATION_MODEL, TRANSLATION_TEMPERATURE, lookup_translation, store_translation, translation_messages
+)
+
+MAX_TTS_WORKERS = 4
+_executor = ThreadPoolExecutor(max_workers=MAX_TTS_WORKERS, thread_name_prefix="tts")
+# How often a finished clip is looked for while the translation is still streaming
+CLIP_POLL_SECONDS = 0.02
+
+# Sentence ends in the scripts page3 translates into (Latin, CJK, Devanagari/Telugu danda)
+_SENTENCE_END = re.compile(r"[.!?।]+[\"'”’)]*\s+|[。！？]+[」』”’)]*")
+
+
+# Function to transcribe a recording straight from memory, without a temp file
+def transcribe_bytes(openai_client, audio_bytes, filename="recording.wav"):
+    with span("openai.transcription", model="whisper-1", bytes_sent=len(audio_bytes)), limit("openai_audio"):
+        transcript = openai_client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(filename, audio_bytes)
+        )
+    return transcript.text
+
+
+# Function to stream a translation as text deltas; a cached translation is yielded whole
+def stream_translation(openai_client, text, target_language):
+    cached = lookup_translation(text, target_language)
+    if cached is not None:
+        yield cached
+        return
+    with span("openai.chat_stream", model=TRANSLATION_MODEL, purpose="translation"):
+        # The slot is held until the response starts streaming
+        with limit("openai_chat"):
+            stream = openai_client.chat.completions.create(
+                model=TRANSLATION_MODEL,
+                messages=translation_messages(text, target_language),
+                temperature=TRANSLATION_TEMPERATURE,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    record_usage(TRANSLATION_MODEL, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content is not None:
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+
+
+# Function to regroup text deltas into complete sentences
+def split_sentences(deltas):
+    buffer = ""
+    for delta in deltas:
+        buffer += delta
+        while True:
+            match = _SENTENCE_END.search(buffer)
+            if not match or (match.end() == len(buffer) and not match.group()[-1].isspace()):
+                break  # A closing quote may still follow in the next delta
+            sentence, buffer = buffer[:match.end()].strip(), buffer[match.end():]
+            if sentence:
+                yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+
+# Function to translate and speak text with the stages overlapped: each finished
+# sentence goes to TTS while later ones are still being translated. The
+# translation is read on its own thread, so a clip is yielded as soon as its
+# speech is ready rather than when the next sentence arrives. Yields ("text",
+# translation so far) and ("audio", clip key) events, the clips in sentence
+# order, then ("done", (translation, key of the whole response)).
+def run_voice_pipeline(openai_client, text, target_language, voice=TTS_VOICE):
+    events = queue.Queue()
+    stop = threading.Event()
+    parts, pending, clips = [], [], []
+
+    def collect(deltas):
+        for delta in deltas:
+            if stop.is_set():
+                return
+            parts.append(delta)
+            yield delta
+
+    def translate():
+        try:
+            with closing(stream_translation(openai_client, text, target_language)) as deltas:
+                for sentence in split_sentences(collect(deltas)):
+                    events.put(("sentence", _executor.submit(synthesize, openai_client, sentence, voice), "".join(parts)))
+        except BaseException as e:
+            events.put(("error", e, None))
+        else:
+            events.put(("end", None, None))
+
+    threading.Thread(target=translate, name="voice-translation", daemon=True).start()
+    translating = True
+    try:
+        while translating or pending:
+            while pending and pending[0].done():
+                clips.append(pending.pop(0).result())
+                yield "audio", clips[-1]
+            if not translating:
+                if pending:
+                    wait(pending[:1])
+                continue
+            try:
+                kind, value, so_far = events.get(timeout=CLIP_POLL_SECONDS if pending else None)
+            except queue.Empty:
+                continue
+            if kind == "sentence":
+                pending.append(value)
+                yield "text", so_far
+            elif kind == "error":
+                raise value
+            else:
+                translating = False
+    finally:
+        stop.set()  # Stops reading the translation if the caller gave up early
+
+    translation = "".join(parts).strip()
+    store_translation(text, target_language, translation)
+
+    # Keep the whole response as one clip for the chat history; mp3 frames concatenate cleanly
+    store = get_store()
+    key = audio_key(translation, voice)
+    if len(clips) == 1:
+        key = clips[0]
+    elif clips and not store.exists(key):
+        store.write(key, b"".join(store.read(clip) for clip in clips))
+    yield "done", (translation, key if clips else None)
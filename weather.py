@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+from cache import TTLCache
+from flow_control import SingleFlight
+
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+# Raw OpenWeatherMap responses shared by every session, keyed by normalized city
+WEATHER_CACHE_TTL = 10 * 60
+weather_cache = TTLCache(maxsize=512, ttl=WEATHER_CACHE_TTL, name="weather")
+
+# LLM clothing/tips advice keyed by a coarse weather bucket, so similar
+# conditions in the same city reuse one generated answer
+ADVICE_CACHE_TTL = 60 * 60
+advice_cache = TTLCache(maxsize=1024, ttl=ADVICE_CACHE_TTL, name="weather_advice")
+
+MAX_BATCH_WORKERS = 8
+_executor = ThreadPoolExecutor(max_workers=MAX_BATCH_WORKERS, thread_name_prefix="weather")
+
+# Sessions asking about the same city at the same moment share one request
+_flight = SingleFlight("weather")
+
+
+# Function to normalize "San Francisco, CA" and "san francisco" to the same key
+def normalize_city(location):
+    if "," in location:
+        location = location.split(",")[0]
+    return " ".join(location.lower().split())
+
+
+# Function to fetch current weather for a city, served from the cache when possible
+def get_weather(location, api_key):
+    city = normalize_city(location)
+    data = weather_cache.get(city)
+    if data is not None:
+        return data
+    return _flight.do(city, lambda: _fetch_weather(city, api_key))
+
+
+def _fetch_weather(city, api_key):
+    response = http_client.get("weather", WEATHER_URL, params={"q": city, "appid": api_key})
+    data = response.json()
+    # Only successful lookups are cached; "city not found" and auth errors are retried
+    if str(data.get("cod")) == "200":
+        weather_cache.set(city, data)
+    return data
+
+
+# Function to resolve weather for several cities in one pass: duplicates are
+# collapsed, cached cities are answered locally and the rest are fetched concurrently.
+# Returns {location: weather data}.
+def get_weather_batch(locations, api_key):
+    cities = {location: normalize_city(location) for location in locations}
+    futures = {city: _executor.submit(get_weather, city, api_key) for city in set(cities.values())}
+    return {location: futures[city].result() for location, city in cities.items()}
+
+
+# Function to reduce weather data to (city, condition code, rounded temperature)
+def weather_bucket(location, data):
+    try:
+        condition = data["weather"][0]["id"]
+        temperature = round(data["main"]["temp"])
+    except (KeyError, IndexError, TypeError):
+        return None
+    return (normalize_city(location), condition, temperature)